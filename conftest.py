@@ -0,0 +1,28 @@
+import pytest
+
+from users import audit, snowflake
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    # Тесты идут в одном процессе, а потоки в тестах не должны ходить в базу через DatabaseCache
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@pytest.fixture(autouse=True)
+def audit_without_background_flush(settings):
+    # Поток записи аудита работал бы со своим соединением в обход транзакции теста
+    settings.AUTH_AUDIT = {**settings.AUTH_AUDIT, "BACKGROUND_FLUSH": False}
+    yield
+    audit.audit_buffer._rows.clear()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def release_snowflake_lease(django_db_setup, django_db_blocker):
+    # Аренда worker id освобождается до удаления тестовой базы, а не в atexit
+    yield
+
+    if snowflake._lease is not None:
+        with django_db_blocker.unblock():
+            snowflake._lease.release()
+        snowflake._lease = None
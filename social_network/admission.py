@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """
+    Адаптивный лимит одновременных запросов (AIMD).
+
+    Задержка учитывается только для успешных ответов (2xx): быстрые отказы
+    валидации не должны занижать опорную задержку. Решение принимается раз
+    в окно из max(window, limit) завершенных запросов: если средняя задержка
+    окна больше опорной в tolerance раз или в окне был ответ 5xx, лимит
+    умножается на backoff, иначе при загрузке от половины лимита растет на 1.
+    Опорная задержка — затухающий минимум средних задержек окон (как в TCP Vegas):
+    она сразу опускается до меньшего среднего, а поднимается не больше чем
+    на drift за окно и только если в окне не было очереди (загрузка ниже
+    половины лимита или лимит минимален). Поэтому рост задержки из-за очереди
+    не становится новой нормой, а реальное замедление обработчиков — становится.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        window: int = 10,
+        drift: float = 0.01,
+    ) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.window = window
+        self.drift = drift
+
+        self.inflight = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.baseline_latency: Optional[float] = None
+        self._lock = threading.Lock()
+        self._reset_window()
+
+    def _reset_window(self) -> None:
+        self._window_requests = 0
+        self._window_successes = 0
+        self._window_latency = 0.0
+        self._window_dropped = False
+        self._window_utilized = False
+
+    def acquire(self) -> bool:
+        with self._lock:
+            if self.inflight >= int(self.limit):
+                self.rejected += 1
+                return False
+
+            self.inflight += 1
+            self.accepted += 1
+            return True
+
+    def release(self, latency: float, success: bool = True, dropped: bool = False) -> None:
+        """
+        Завершает запрос. success — ответ 2xx, dropped — ответ 5xx или исключение;
+        остальные ответы (3xx, 4xx) только освобождают место.
+        """
+        with self._lock:
+            self._window_utilized |= self.inflight >= self.limit / 2
+            self.inflight -= 1
+
+            if not (success or dropped):
+                return
+
+            self._window_requests += 1
+            self._window_dropped |= dropped
+
+            if success:
+                self._window_successes += 1
+                self._window_latency += latency
+
+            if self._window_requests >= max(self.window, int(self.limit)):
+                self._close_window()
+
+    def _close_window(self) -> None:
+        average = self._window_latency / self._window_successes if self._window_successes else None
+
+        if self.baseline_latency is None:
+            self.baseline_latency = average
+
+        congested = self._window_dropped or (
+            average is not None
+            and self.baseline_latency is not None
+            and average > self.baseline_latency * self.tolerance
+        )
+
+        if congested:
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        elif self._window_utilized:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+        if average is not None and self.baseline_latency is not None:
+            queued = self._window_utilized and self.limit > self.min_limit
+            ceiling = self.baseline_latency if queued else self.baseline_latency * (1 + self.drift)
+            self.baseline_latency = min(average, ceiling)
+
+        self._reset_window()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self.limit),
+                "inflight": self.inflight,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "baseline_latency": self.baseline_latency,
+            }
+
+
+# Лимитеры классов маршрутов текущего процесса: {имя класса: (префиксы путей, лимитер)}
+limiters: dict[str, tuple[tuple[str, ...], AdaptiveLimiter]] = {}
+
+
+def configure_limiters() -> None:
+    limiters.clear()
+
+    for name, config in settings.ADMISSION_CONTROL["CLASSES"].items():
+        limiters[name] = (
+            tuple(config["PATHS"]),
+            AdaptiveLimiter(
+                initial_limit=config["INITIAL_LIMIT"],
+                min_limit=config.get("MIN_LIMIT", 1),
+                max_limit=config.get("MAX_LIMIT", 1000),
+                tolerance=config.get("TOLERANCE", 2.0),
+                window=config.get("WINDOW", 10),
+            ),
+        )
+
+
+def limiter_for(path: str) -> Optional[AdaptiveLimiter]:
+    for prefixes, limiter in limiters.values():
+        if path.startswith(prefixes):
+            return limiter
+    return None
+
+
+class AdmissionControlMiddleware:
+    """
+    Ограничивает число одновременных запросов для каждого класса маршрутов
+    из ADMISSION_CONTROL["CLASSES"] (классы проверяются по порядку, по префиксу пути).
+
+    Запросы сверх текущего лимита сразу получают 503 с заголовком Retry-After,
+    не занимая обработчик. Лимиты действуют в пределах одного процесса.
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+        self.retry_after = settings.ADMISSION_CONTROL.get("RETRY_AFTER", 1)
+        configure_limiters()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        limiter = limiter_for(request.path_info)
+
+        if limiter is None:
+            return self.get_response(request)
+
+        if not limiter.acquire():
+            logger.warning("Request to %s rejected by admission control", request.path_info)
+            response = JsonResponse(
+                {"detail": _("Service is overloaded, please retry later")},
+                status=503,
+            )
+            response["Retry-After"] = str(self.retry_after)
+            return response
+
+        started = time.monotonic()
+        success, dropped = False, True
+
+        try:
+            response = self.get_response(request)
+            success, dropped = 200 <= response.status_code < 300, response.status_code >= 500
+            return response
+        finally:
+            limiter.release(time.monotonic() - started, success=success, dropped=dropped)
+
+
+class AdmissionMetricsView(APIView):
+    """
+    View для просмотра текущих лимитов и количества отклоненных запросов
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request) -> Response:
+        return Response({name: limiter.snapshot() for name, (_prefixes, limiter) in limiters.items()})
@@ -75,6 +75,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'social_network.admission.AdmissionControlMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -93,6 +94,11 @@ ROOT_URLCONF = 'social_network.urls'
 AUTH_USER_MODEL = 'users.CustomUser'
 
 
+AUTHENTICATION_BACKENDS = [
+    'users.backends.UsernameOrEmailBackend',
+]
+
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -150,14 +156,136 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+# Загрузка аватара частями: каталог временных файлов (вне MEDIA_ROOT, чтобы
+# незавершенные загрузки не были доступны по MEDIA_URL), максимальный размер части
+# и время в секундах, после которого брошенная загрузка удаляется (process_avatar_uploads)
+AVATAR_UPLOAD_TMP_DIR = config('AVATAR_UPLOAD_TMP_DIR', default=os.path.join(BASE_DIR, 'tmp', 'avatar_uploads'))
+AVATAR_UPLOAD_MAX_CHUNK_SIZE = 1024 * 1024
+AVATAR_UPLOAD_EXPIRY = 24 * 60 * 60
+
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# Кеш должен быть общим для всех процессов: в нем хранятся присутствие, ответы
+# для Idempotency-Key и версии профиля JWT (проверка users.E001 отклоняет LocMemCache).
+# С REDIS_URL используется Redis (нужен пакет redis), иначе — таблица в базе,
+# которую создает команда createcachetable.
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+    },
+}
+
+
+# Номер процесса для SnowflakeField (0..1023). Если не задан, каждый процесс арендует
+# свободный номер в таблице users_snowflakeworkerlease на SNOWFLAKE_WORKER_LEASE_TTL секунд.
+# Явный номер допустим только для единственного процесса: дочерние процессы его наследуют.
+SNOWFLAKE_WORKER_ID = config('SNOWFLAKE_WORKER_ID', default=None)
+SNOWFLAKE_WORKER_LEASE_TTL = 60
+
+
+# Лимиты одновременных запросов по классам маршрутов (AdmissionControlMiddleware)
+ADMISSION_CONTROL = {
+    'RETRY_AFTER': 1,
+    'CLASSES': {
+        'auth': {
+            'PATHS': ['/api/v1/register/', '/api/v1/login/'],
+            'INITIAL_LIMIT': 4,
+            'MIN_LIMIT': 1,
+            'MAX_LIMIT': 32,
+        },
+        'read': {
+            'PATHS': ['/api/v1/profile/', '/api/v1/presence/'],
+            'INITIAL_LIMIT': 64,
+            'MIN_LIMIT': 8,
+            'MAX_LIMIT': 512,
+        },
+        'default': {
+            'PATHS': ['/'],
+            'INITIAL_LIMIT': 32,
+            'MIN_LIMIT': 4,
+            'MAX_LIMIT': 256,
+        },
+    },
+}
+
+
+# Хранилище статуса онлайн в кеше CACHES[alias] (см. CACHES выше).
+# users.presence.LocalPresenceBackend (OPTIONS: ttl, bucket_seconds) хранит
+# данные в памяти процесса и подходит только для одного процесса.
+PRESENCE_BACKEND = {
+    'BACKEND': 'users.presence.CachePresenceBackend',
+    'OPTIONS': {'alias': 'default', 'ttl': 120},
+}
+
+
+# Фоновое удаление пользователей (run_purge_jobs)
+PURGE_FILE_WORKERS = 8
+PURGE_MAX_REPLICATION_LAG = 5
+
+
+# Журнал аудита аутентификации: буфер, запись через COPY, дневные секции
+# (manage_audit_partitions нужно запускать по расписанию, например раз в час)
+AUTH_AUDIT = {
+    'BACKGROUND_FLUSH': True,
+    'FLUSH_INTERVAL': 1.0,
+    'BATCH_SIZE': 500,
+    'BUFFER_SIZE': 10000,
+    'PARTITIONS_AHEAD': 2,
+    'RETENTION_DAYS': 30,
+    'MAX_FAILED_ATTEMPTS': 10,
+    'MAX_FAILED_ATTEMPTS_PER_USERNAME': 100,
+    'FAILED_ATTEMPTS_WINDOW': 15,
+}
+
+
+# Ответы на запросы с заголовком Idempotency-Key
+IDEMPOTENCY_CACHE_ALIAS = 'default'
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=60 * 60 * 24, cast=int)
+IDEMPOTENCY_LOCK_TTL = 60
+IDEMPOTENCY_LOCK_WAIT = 10
+
+
+# Приемники событий outbox для dispatch_user_events. События содержат email,
+# поэтому файл по умолчанию пишется в каталог вне MEDIA_ROOT и вне git
+USER_EVENT_LOG_PATH = config('USER_EVENT_LOG_PATH', default=os.path.join(BASE_DIR, 'tmp', 'user_events.jsonl'))
+# Сколько дней хранить уже доставленные события до удаления
+USER_EVENT_RETENTION_DAYS = config('USER_EVENT_RETENTION_DAYS', default=7, cast=int)
+USER_EVENT_SINKS = [
+    {
+        'BACKEND': 'users.outbox.FileSink',
+        'OPTIONS': {'path': USER_EVENT_LOG_PATH},
+    },
+]
+
+
+# Профиль в JWT: request.user строится из токена без запроса к базе.
+# Версия профиля кешируется на JWT_PROFILE_VERSION_CACHE_TTL секунд — для нескольких
+# процессов кеш должен быть общим, иначе устаревшие claims принимаются до истечения TTL.
+JWT_PROFILE_CLAIMS = config('JWT_PROFILE_CLAIMS', default=False, cast=bool)
+JWT_PROFILE_VERSION_CACHE_ALIAS = 'default'
+JWT_PROFILE_VERSION_CACHE_TTL = 60
+
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.ProfileClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Число обратных прокси перед приложением. При 0 IP клиента для throttling и журнала
+    # аудита берется из REMOTE_ADDR, а X-Forwarded-For, присланный клиентом, игнорируется;
+    # за прокси нужно указать их количество.
+    'NUM_PROXIES': config('NUM_PROXIES', default=0, cast=int),
 }
@@ -0,0 +1,116 @@
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from .admission import AdaptiveLimiter, AdmissionControlMiddleware, limiters
+
+
+class TestAdaptiveLimiter:
+    def test_rejects_over_limit(self):
+        limiter = AdaptiveLimiter(initial_limit=2)
+
+        assert limiter.acquire()
+        assert limiter.acquire()
+        assert not limiter.acquire()
+        assert limiter.snapshot()["rejected"] == 1
+
+    def test_limit_grows_while_latency_is_stable(self):
+        limiter = AdaptiveLimiter(initial_limit=2, max_limit=10)
+
+        for _ in range(20):
+            limiter.acquire()
+            limiter.acquire()
+            limiter.release(0.01)
+            limiter.release(0.01)
+
+        assert limiter.snapshot()["limit"] > 2
+
+    def test_limit_shrinks_once_per_window(self):
+        limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, window=10)
+
+        for latency in [0.01] * 10 + [0.5] * 10:
+            limiter.acquire()
+            limiter.release(latency)
+
+        assert limiter.snapshot()["limit"] == 9
+
+        for _ in range(10):
+            limiter.acquire()
+            limiter.release(0.01, success=False, dropped=True)
+
+        assert limiter.snapshot()["limit"] == 8
+
+    def simulate(self, limiter, clients, responses):
+        # clients параллельных клиентов, каждый сразу повторяет запрос;
+        # responses — циклический список (задержка, успех)
+        for step in range(1000):
+            admitted = [limiter.acquire() for _ in range(clients)]
+            for index, ok in enumerate(admitted):
+                if ok:
+                    latency, success = responses[(step * clients + index) % len(responses)]
+                    limiter.release(latency, success=success)
+
+    def test_fast_client_errors_do_not_look_like_congestion(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=32)
+
+        # 20% быстрых отказов валидации (4xx) среди медленных успешных входов
+        self.simulate(limiter, 3, [(0.005, False)] + [(0.25, True)] * 4)
+
+        assert limiter.snapshot()["rejected"] == 0
+        assert limiter.snapshot()["limit"] >= 3
+
+    def test_mixed_fast_and_slow_routes_keep_limit(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=32)
+
+        self.simulate(limiter, 3, [(0.005, True), (0.25, True), (0.02, True), (0.3, True)])
+
+        assert limiter.snapshot()["rejected"] == 0
+        assert limiter.snapshot()["limit"] >= 4
+
+
+    def test_queueing_delay_does_not_raise_baseline(self):
+        limiter = AdaptiveLimiter(initial_limit=4, max_limit=256)
+
+        # Обработчик держит 8 запросов одновременно, остальные ждут в очереди:
+        # задержка растет пропорционально числу запросов сверх 8
+        for _ in range(3000):
+            inflight = 0
+            while limiter.acquire():
+                inflight += 1
+            for _ in range(inflight):
+                limiter.release(0.05 * max(1, inflight / 8))
+
+        snapshot = limiter.snapshot()
+        assert 8 <= snapshot["limit"] <= 8 * limiter.tolerance + 2
+        assert snapshot["baseline_latency"] == pytest.approx(0.05)
+
+
+class TestAdmissionControlMiddleware:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.ADMISSION_CONTROL = {
+            "RETRY_AFTER": 3,
+            "CLASSES": {
+                "auth": {"PATHS": ["/api/v1/login/"], "INITIAL_LIMIT": 1},
+            },
+        }
+
+    def test_sheds_load_with_retry_after(self):
+        responses = []
+
+        def get_response(request):
+            # Параллельный запрос, пока первый еще обрабатывается
+            responses.append(middleware(RequestFactory().post("/api/v1/login/")))
+            return HttpResponse(status=200)
+
+        middleware = AdmissionControlMiddleware(get_response)
+
+        assert middleware(RequestFactory().post("/api/v1/login/")).status_code == 200
+        assert responses[0].status_code == 503
+        assert responses[0]["Retry-After"] == "3"
+        assert limiters["auth"][1].snapshot()["rejected"] == 1
+
+    def test_unclassified_paths_pass_through(self):
+        middleware = AdmissionControlMiddleware(lambda request: HttpResponse(status=200))
+
+        assert middleware(RequestFactory().get("/api/v1/profile/")).status_code == 200
@@ -6,6 +6,8 @@ from drf_yasg import openapi
 
 from debug_toolbar.toolbar import debug_toolbar_urls
 
+from .admission import AdmissionMetricsView
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -24,6 +26,7 @@ schema_view = get_schema_view(
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
+    path('api/v1/admission/', AdmissionMetricsView.as_view(), name='admission-metrics'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ] + debug_toolbar_urls()
@@ -1,6 +1,7 @@
 from django.contrib import admin
+from django.utils.translation import gettext_lazy as _
 
-from .models import CustomUser
+from .models import AuthAuditEvent, CustomUser, PurgeJob
 
 
 @admin.register(CustomUser)
@@ -9,3 +10,42 @@ class AdminUser(admin.ModelAdmin):
     list_filter = ('username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser')
     search_fields = ('username', 'email', 'first_name', 'last_name')
     raw_id_fields = ('groups', 'user_permissions')
+    actions = ('purge_deactivate', 'purge_delete')
+
+    def _create_purge_job(self, request, queryset, action):
+        job = PurgeJob.objects.create(action=action, user_ids=list(queryset.values_list('pk', flat=True)))
+        self.message_user(request, _("Purge job #%(id)s created for %(count)s users") % {
+            'id': job.pk,
+            'count': len(job.user_ids),
+        })
+
+    @admin.action(description=_("Deactivate selected users in background"))
+    def purge_deactivate(self, request, queryset):
+        self._create_purge_job(request, queryset, PurgeJob.DEACTIVATE)
+
+    @admin.action(description=_("Delete selected users in background"))
+    def purge_delete(self, request, queryset):
+        self._create_purge_job(request, queryset, PurgeJob.DELETE)
+
+
+@admin.register(PurgeJob)
+class AdminPurgeJob(admin.ModelAdmin):
+    list_display = ('id', 'action', 'status', 'processed', 'created_at', 'finished_at')
+    list_filter = ('action', 'status')
+    readonly_fields = ('status', 'cursor', 'processed', 'pending_files', 'next_batch_at', 'error', 'finished_at')
+    exclude = ('user_ids',)
+
+
+@admin.register(AuthAuditEvent)
+class AdminAuthAuditEvent(admin.ModelAdmin):
+    list_display = ('created_at', 'event_type', 'username', 'ip', 'reason')
+    list_filter = ('event_type',)
+    search_fields = ('=username', '=ip')
+    ordering = ('-created_at',)
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -8,3 +8,6 @@ class UsersConfig(AppConfig):
     
     verbose_name = _('User')
     verbose_name_plural = _('Users')
+
+    def ready(self) -> None:
+        from users import checks  # noqa: F401
@@ -0,0 +1,259 @@
+import atexit
+import io
+import ipaddress
+import logging
+import os
+import threading
+from collections import deque
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import DatabaseError, connection as default_connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.throttling import BaseThrottle
+
+from users.models import AuthAuditEvent
+from users.snowflake import generate_ids
+
+logger = logging.getLogger(__name__)
+
+
+TABLE = AuthAuditEvent._meta.db_table
+PARTITION_PREFIX = f"{TABLE}_p"
+DEFAULT_PARTITION = f"{TABLE}_default"
+COPY_COLUMNS = ("id", "created_at", "event_type", "username", "ip", "reason")
+
+
+def _partition_name(day: date) -> str:
+    return f"{PARTITION_PREFIX}{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+
+
+def _create_partition(cursor: Any, day: date) -> None:
+    # Секция создается отдельной таблицей и присоединяется после переноса строк
+    # этого дня из DEFAULT-секции, иначе PostgreSQL отклонит ее с CheckViolation
+    name = _partition_name(day)
+    bounds = [_day_start(day), _day_start(day + timedelta(days=1))]
+
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f"""
+        WITH moved AS (
+            DELETE FROM "{DEFAULT_PARTITION}" WHERE created_at >= %s AND created_at < %s RETURNING *
+        )
+        INSERT INTO "{name}" SELECT * FROM moved
+        """,
+        bounds,
+    )
+
+    if cursor.rowcount:
+        logger.warning("Moved %s audit events from %s to %s", cursor.rowcount, DEFAULT_PARTITION, name)
+
+    cursor.execute(f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)', bounds)
+
+
+def ensure_partitions(days_ahead: int = 2, connection: Any = None) -> list[str]:
+    """
+    Создает дневные секции (по UTC) на сегодня, days_ahead дней вперед и на дни,
+    строки которых попали в DEFAULT-секцию (например, если команда запускалась с опозданием).
+    Каждый день создается в своей транзакции: ошибка для одного дня записывается
+    в лог и не мешает остальным. Возвращает имена созданных секций.
+    """
+    connection = connection or default_connection
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+    days = {today + timedelta(days=offset) for offset in range(days_ahead + 1)}
+    created = []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT DISTINCT (created_at AT TIME ZONE 'UTC')::date FROM "{DEFAULT_PARTITION}"
+            """
+        )
+        days.update(row[0] for row in cursor.fetchall())
+
+        for day in sorted(days):
+            name = _partition_name(day)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+
+            if cursor.fetchone()[0] is not None:
+                continue
+
+            try:
+                with transaction.atomic(using=connection.alias):
+                    _create_partition(cursor, day)
+            except DatabaseError as e:
+                logger.error("Failed to create audit partition %s: %s", name, e)
+                continue
+
+            created.append(name)
+
+    return created
+
+
+def drop_partitions(retention_days: int, connection: Any = None) -> list[str]:
+    """
+    Отсоединяет и удаляет дневные секции старше retention_days дней.
+    Возвращает имена удаленных секций.
+    """
+    connection = connection or default_connection
+    cutoff = _partition_name(timezone.now().astimezone(dt_timezone.utc).date() - timedelta(days=retention_days))
+    dropped = []
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND child.relname LIKE %s
+            """,
+            [TABLE, PARTITION_PREFIX.replace("_", "\\_") + "%"],
+        )
+
+        # Имена секций с датой в формате YYYYMMDD сравниваются как строки
+        for name in sorted(row[0] for row in cursor.fetchall()):
+            if name >= cutoff:
+                continue
+
+            cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{name}"')
+            cursor.execute(f'DROP TABLE "{name}"')
+            dropped.append(name)
+
+    return dropped
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+class AuditBuffer:
+    """
+    Буфер событий аудита в памяти процесса.
+
+    record() только добавляет строку в очередь и не обращается к базе,
+    поэтому не влияет на время ответа. Фоновый поток раз в FLUSH_INTERVAL
+    секунд записывает накопленные строки пачками через COPY. Если база
+    недоступна, пачка теряется, а при переполнении BUFFER_SIZE вытесняются
+    самые старые строки — аудит не должен мешать входу пользователей.
+    """
+
+    def __init__(self) -> None:
+        self._rows: deque[tuple[Any, ...]] = deque(maxlen=settings.AUTH_AUDIT["BUFFER_SIZE"])
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, event_type: str, username: str = "", ip: Optional[str] = None, reason: str = "") -> None:
+        self._rows.append((timezone.now(), event_type, username.lower()[:150], ip, reason))
+
+        if len(self._rows) >= settings.AUTH_AUDIT["BATCH_SIZE"]:
+            self._wakeup.set()
+
+        if self._thread is None and settings.AUTH_AUDIT["BACKGROUND_FLUSH"]:
+            self._start()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="auth-audit-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            self._wakeup.wait(settings.AUTH_AUDIT["FLUSH_INTERVAL"])
+            self._wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error("Failed to write authentication audit events: %s", e)
+                default_connection.close()
+
+    def flush(self) -> int:
+        """
+        Записывает накопленные строки через COPY. Возвращает количество строк.
+        """
+        with self._lock:
+            rows = [self._rows.popleft() for _ in range(len(self._rows))]
+
+        if not rows:
+            return 0
+
+        buffer = io.StringIO()
+        for row_id, row in zip(generate_ids(len(rows)), rows):
+            buffer.write("\t".join(_copy_value(value) for value in (row_id, *row)) + "\n")
+        buffer.seek(0)
+
+        with default_connection.cursor() as cursor:
+            cursor.cursor.copy_expert(f'COPY "{TABLE}" ({", ".join(COPY_COLUMNS)}) FROM STDIN', buffer)
+
+        return len(rows)
+
+
+audit_buffer = AuditBuffer()
+
+
+def _reset_after_fork() -> None:
+    # Поток записи не переживает fork, а строки родителя запишет родитель
+    global audit_buffer
+    audit_buffer = AuditBuffer()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_on_exit() -> None:
+    try:
+        audit_buffer.flush()
+    except Exception as e:
+        logger.error("Failed to write authentication audit events on exit: %s", e)
+
+
+def client_ip(request: Any) -> Optional[str]:
+    """
+    IP-адрес клиента, определенный так же, как в throttle-классах DRF
+    (X-Forwarded-For с учетом REST_FRAMEWORK["NUM_PROXIES"]).
+    Если результат не является IP-адресом, возвращается None.
+    """
+    if request is None:
+        return None
+
+    try:
+        return str(ipaddress.ip_address(BaseThrottle().get_ident(request)))
+    except ValueError:
+        return None
+
+
+def record(event_type: str, username: str = "", ip: Optional[str] = None, reason: str = "") -> None:
+    audit_buffer.record(event_type, username, ip, reason)
+
+
+def failed_attempts(ip: Optional[str] = None, username: Optional[str] = None, minutes: int = 15) -> int:
+    """
+    Количество неудачных входов за последние minutes минут с IP-адреса, по имени
+    пользователя или, если заданы оба, по имени пользователя с этого IP-адреса.
+    Запрос затрагивает только свежие секции и использует индексы (ip|username, created_at).
+    """
+    since = timezone.now() - timedelta(minutes=minutes)
+    condition = Q()
+
+    if ip is not None:
+        condition &= Q(ip=ip)
+    if username is not None:
+        condition &= Q(username=username.lower())
+
+    return AuthAuditEvent.objects.filter(
+        condition, event_type=AuthAuditEvent.LOGIN_FAILED, created_at__gte=since
+    ).count()
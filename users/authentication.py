@@ -0,0 +1,89 @@
+from typing import Any, Optional, cast
+
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken, Token
+
+from users.claims import CLAIMS_FORMAT_VERSION, CLAIMS_KEY, build_claims, claims_enabled, get_profile_version
+
+
+class ProfileRefreshToken(RefreshToken):
+    """
+    Refresh-токен, который в режиме JWT_PROFILE_CLAIMS добавляет блок профиля
+    только в access-токен, выпущенный вместе с ним. В сам refresh-токен блок
+    не попадает: иначе access-токены, полученные обновлением, несли бы
+    устаревшую profile_version. Такие токены выпускаются без блока профиля,
+    и пользователь для них загружается из базы.
+    """
+
+    no_copy_claims = RefreshToken.no_copy_claims + (CLAIMS_KEY,)  # type: ignore[assignment]
+
+    profile_claims: Optional[dict[str, Any]] = None
+
+    @classmethod
+    def for_user(cls, user: Any) -> Any:
+        token = cast(ProfileRefreshToken, super().for_user(user))
+
+        if claims_enabled():
+            token.profile_claims = build_claims(user)
+
+        return token
+
+    @property
+    def access_token(self) -> AccessToken:
+        access = super().access_token
+
+        if self.profile_claims is not None:
+            access[CLAIMS_KEY] = self.profile_claims
+
+        return access
+
+
+class ProfileClaimsUser(TokenUser):
+    """
+    Пользователь, построенный из блока профиля в токене, без запроса к базе.
+    """
+
+    @cached_property
+    def username(self) -> str:
+        return self.token[CLAIMS_KEY]["u"]
+
+    @cached_property
+    def is_active(self) -> bool:  # type: ignore[override]
+        return self.token[CLAIMS_KEY]["a"]
+
+    @cached_property
+    def is_staff(self) -> bool:
+        return self.token[CLAIMS_KEY]["s"]
+
+    @cached_property
+    def profile_version(self) -> int:
+        return self.token[CLAIMS_KEY]["v"]
+
+
+class ProfileClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация, которая в режиме JWT_PROFILE_CLAIMS строит request.user
+    из блока профиля в токене. Токен отклоняется, если его profile_version
+    не совпадает с текущей (берется из кеша). Токены без блока профиля
+    и выключенный режим обрабатываются как в JWTAuthentication.
+    """
+
+    def get_user(self, validated_token: Token) -> Any:
+        claims = validated_token.get(CLAIMS_KEY)
+
+        if not claims_enabled() or not claims or claims.get("f") != CLAIMS_FORMAT_VERSION:
+            return super().get_user(validated_token)
+
+        user = ProfileClaimsUser(validated_token)
+
+        if get_profile_version(user.id) != user.profile_version:
+            raise AuthenticationFailed(_("Token profile claims are stale"), code="stale_claims")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        return user
@@ -0,0 +1,48 @@
+from typing import Any, Optional
+
+from django.contrib.auth.backends import ModelBackend
+from django.http import HttpRequest
+
+from users.models import CustomUser
+
+
+class UsernameOrEmailBackend(ModelBackend):
+    """
+    Бэкенд аутентификации по имени пользователя или электронной почте.
+
+    Идентификатор сравнивается без учета регистра одним запросом
+    по функциональным индексам LOWER(username) и LOWER(email).
+    """
+
+    def authenticate(
+        self,
+        request: Optional[HttpRequest],
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Optional[CustomUser]:
+        if username is None:
+            username = kwargs.get(CustomUser.USERNAME_FIELD)
+
+        if username is None or password is None:
+            return None
+
+        # Имя пользователя может совпасть с чужим email, поэтому берем
+        # не больше двух строк и отдаем приоритет совпадению по username.
+        candidates = list(
+            CustomUser.objects.filter_case_insensitive(username=username, email=username)[:2]
+        )
+        candidates.sort(key=lambda user: user.username.lower() != username.lower())
+
+        if not candidates:
+            # Хешируем пароль впустую, чтобы время ответа не выдавало
+            # существование пользователя (как в ModelBackend).
+            CustomUser().set_password(password)
+            return None
+
+        user = candidates[0]
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+
+        return None
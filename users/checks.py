@@ -0,0 +1,43 @@
+from typing import Any
+
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+# Кеши, которые не видны другим процессам
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def _shared_cache_aliases() -> dict[str, str]:
+    """
+    Настройки, которым нужен общий для всех процессов кеш, и их алиасы в CACHES.
+    """
+    aliases = {"IDEMPOTENCY_CACHE_ALIAS": settings.IDEMPOTENCY_CACHE_ALIAS}
+
+    if settings.PRESENCE_BACKEND["BACKEND"] == "users.presence.CachePresenceBackend":
+        aliases["PRESENCE_BACKEND"] = settings.PRESENCE_BACKEND.get("OPTIONS", {}).get("alias", "default")
+
+    if settings.JWT_PROFILE_CLAIMS:
+        aliases["JWT_PROFILE_VERSION_CACHE_ALIAS"] = settings.JWT_PROFILE_VERSION_CACHE_ALIAS
+
+    return aliases
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs: Any, **kwargs: Any) -> list[Error]:
+    errors = []
+
+    for setting, alias in _shared_cache_aliases().items():
+        backend = settings.CACHES.get(alias, {}).get("BACKEND")
+
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(Error(
+                f"{setting} uses cache '{alias}' ({backend}), which is not shared between processes.",
+                hint="Configure a shared cache (Redis, Memcached or DatabaseCache) in CACHES.",
+                id="users.E001",
+            ))
+
+    return errors
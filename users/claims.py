@@ -0,0 +1,64 @@
+from typing import Any, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+# Ключ и версия формата блока профиля в JWT
+CLAIMS_KEY = "pc"
+CLAIMS_FORMAT_VERSION = 1
+
+
+def claims_enabled() -> bool:
+    return getattr(settings, "JWT_PROFILE_CLAIMS", False)
+
+
+def _cache():
+    return caches[getattr(settings, "JWT_PROFILE_VERSION_CACHE_ALIAS", "default")]
+
+
+def _cache_key(user_id: Any) -> str:
+    return f"profile_version:{user_id}"
+
+
+def build_claims(user: Any) -> dict[str, Any]:
+    """
+    Компактный блок профиля для access-токена:
+    f — версия формата, u — username, a — is_active, s — is_staff, v — profile_version.
+    """
+    return {
+        "f": CLAIMS_FORMAT_VERSION,
+        "u": user.username,
+        "a": user.is_active,
+        "s": user.is_staff,
+        "v": user.profile_version,
+    }
+
+
+def cache_profile_version(user_id: Any, version: int) -> None:
+    _cache().set(_cache_key(user_id), version, timeout=settings.JWT_PROFILE_VERSION_CACHE_TTL)
+
+
+def forget_profile_versions(user_ids: Iterable[Any]) -> None:
+    """
+    Сбрасывает кешированные версии после массовых изменений в обход save().
+    """
+    _cache().delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def get_profile_version(user_id: Any) -> Optional[int]:
+    """
+    Возвращает текущую profile_version пользователя из кеша,
+    при промахе — одним запросом к базе с последующим кешированием.
+    """
+    version = _cache().get(_cache_key(user_id))
+
+    if version is None:
+        from users.models import CustomUser
+
+        version = CustomUser.objects.filter(pk=user_id).values_list("profile_version", flat=True).first()
+
+        if version is not None:
+            cache_profile_version(user_id, version)
+
+    return version
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import time
+from functools import wraps
+from typing import Any, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+
+def _cache():
+    return caches[getattr(settings, "IDEMPOTENCY_CACHE_ALIAS", "default")]
+
+
+def _fingerprint(request: Request) -> str:
+    # Тело может содержать пароль: HMAC на SECRET_KEY, чтобы отпечаток
+    # из кеша нельзя было перебирать без ключа
+    payload = json.dumps(request.data, sort_keys=True, default=str)
+    return salted_hmac("users.idempotency.fingerprint", payload, algorithm="sha256").hexdigest()
+
+
+def _cache_key(view: Any, request: Request, key: str) -> str:
+    user = request.user.pk if request.user and request.user.is_authenticated else "anon"
+    scope = f"{type(view).__name__}:{request.method}:{user}:{key}"
+    return "idempotency:" + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _replay(stored: tuple[str, int, Any]) -> Response:
+    _fingerprint_value, status_code, data = stored
+    response = Response(data, status=status_code)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _wait_for_result(cache_key: str) -> Optional[tuple[str, int, Any]]:
+    deadline = time.monotonic() + getattr(settings, "IDEMPOTENCY_LOCK_WAIT", 10)
+
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        stored = _cache().get(cache_key)
+        if stored is not None:
+            return stored
+
+    return None
+
+
+def idempotent(handler: Optional[Callable[..., Response]] = None, *, exclude: Iterable[str] = ()) -> Any:
+    """
+    Декоратор для изменяющих методов APIView с поддержкой заголовка Idempotency-Key.
+    Применяется как @idempotent или @idempotent(exclude=(...)).
+
+    Первый ответ (кроме 5xx) сохраняется в кеше на IDEMPOTENCY_KEY_TTL секунд
+    в виде (отпечаток тела запроса, статус, данные). Повторный запрос с тем же
+    ключом получает сохраненный ответ без повторного выполнения обработчика.
+    Параллельные запросы с одним ключом ждут результата первого.
+    Запрос без заголовка обрабатывается как обычно.
+
+    Поля ответа из exclude (например, токены) в кеш не попадают,
+    и повторный ответ приходит без них.
+
+    Для нескольких процессов кеш IDEMPOTENCY_CACHE_ALIAS должен быть общим.
+    """
+    excluded = frozenset(exclude)
+
+    def decorator(handler: Callable[..., Response]) -> Callable[..., Response]:
+        @wraps(handler)
+        def wrapper(self: Any, request: Request, *args: Any, **kwargs: Any) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+
+            if not key:
+                return handler(self, request, *args, **kwargs)
+
+            if len(key) > MAX_KEY_LENGTH:
+                logger.error("Idempotency key is too long")
+                return Response(
+                    {"detail": _("Idempotency key is too long")},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            cache = _cache()
+            cache_key = _cache_key(self, request, key)
+            lock_key = f"{cache_key}:lock"
+            fingerprint = _fingerprint(request)
+            ttl = getattr(settings, "IDEMPOTENCY_KEY_TTL", 60 * 60 * 24)
+            lock_ttl = getattr(settings, "IDEMPOTENCY_LOCK_TTL", 60)
+
+            stored = cache.get(cache_key)
+            locked = False
+
+            if stored is None:
+                if cache.add(lock_key, 1, timeout=lock_ttl):
+                    locked = True
+                    # Первый запрос мог завершиться и снять блокировку между get и add
+                    stored = cache.get(cache_key)
+                else:
+                    logger.info("Request with idempotency key is in progress, waiting..")
+                    stored = _wait_for_result(cache_key)
+
+                    if stored is None:
+                        logger.warning("Request with idempotency key is still in progress")
+                        return Response(
+                            {"detail": _("A request with this idempotency key is in progress")},
+                            status=status.HTTP_409_CONFLICT,
+                        )
+
+            if stored is not None and locked:
+                cache.delete(lock_key)
+
+            if stored is not None:
+                if stored[0] != fingerprint:
+                    logger.error("Idempotency key reused with a different payload")
+                    return Response(
+                        {"detail": _("Idempotency key was used with a different request")},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    )
+
+                logger.info("Replaying stored response for idempotency key")
+                return _replay(stored)
+
+            try:
+                response = handler(self, request, *args, **kwargs)
+
+                if response.status_code < 500:
+                    # Сохраненный ответ не перезаписывается
+                    data = response.data
+
+                if excluded and isinstance(data, dict):
+                    data = {name: value for name, value in data.items() if name not in excluded}
+
+                cache.add(cache_key, (fingerprint, response.status_code, data), timeout=ttl)
+            finally:
+                cache.delete(lock_key)
+
+            return response
+
+        return wrapper
+
+    return decorator(handler) if handler is not None else decorator
@@ -0,0 +1,38 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from users.snowflake import SnowflakeGenerator
+
+
+class Command(BaseCommand):
+    help = "Измеряет пропускную способность генератора SnowflakeField"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=1_000_000)
+        parser.add_argument("--threads", type=int, default=1)
+        parser.add_argument("--batch", type=int, default=0, help="Выдавать id пачками через generate()")
+
+    def handle(self, *args, **options):
+        generator = SnowflakeGenerator(worker_id=0)
+        count, threads, batch = options["count"], options["threads"], options["batch"]
+        per_thread = count // threads
+
+        def work(_):
+            if batch:
+                ids = []
+                for _start in range(0, per_thread, batch):
+                    ids.extend(generator.generate(batch))
+                return ids
+            return [generator.next_id() for _i in range(per_thread)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = [value for chunk in executor.map(work, range(threads)) for value in chunk]
+        elapsed = time.perf_counter() - started
+
+        if len(set(results)) != len(results):
+            self.stderr.write("Duplicate ids generated")
+
+        self.stdout.write(f"{len(results)} ids in {elapsed:.3f}s: {len(results) / elapsed:,.0f} ids/s")
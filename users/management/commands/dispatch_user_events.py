@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.outbox import OutboxDispatcher
+
+
+class Command(BaseCommand):
+    help = "Доставляет события жизненного цикла пользователей из outbox в USER_EVENT_SINKS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--interval", type=float, default=1.0, help="Пауза в секундах, если событий нет")
+        parser.add_argument("--once", action="store_true", help="Доставить накопившиеся события и выйти")
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=None,
+            help="Сколько дней хранить доставленные события (по умолчанию USER_EVENT_RETENTION_DAYS)",
+        )
+        parser.add_argument(
+            "--cleanup-interval",
+            type=float,
+            default=3600.0,
+            help="Как часто в секундах удалять старые доставленные события",
+        )
+
+    def handle(self, *args, **options):
+        retention_days = options["retention_days"]
+        if retention_days is None:
+            retention_days = settings.USER_EVENT_RETENTION_DAYS
+
+        dispatcher = OutboxDispatcher(batch_size=options["batch_size"], retention=timedelta(days=retention_days))
+        dispatcher.run(
+            interval=options["interval"],
+            once=options["once"],
+            cleanup_interval=options["cleanup_interval"],
+        )
+        self.stdout.write(str(dispatcher.metrics()))
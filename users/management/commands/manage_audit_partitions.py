@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.audit import drop_partitions, ensure_partitions
+
+
+class Command(BaseCommand):
+    help = "Создает будущие дневные секции журнала аудита и удаляет устаревшие"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days-ahead", type=int, default=settings.AUTH_AUDIT["PARTITIONS_AHEAD"])
+        parser.add_argument("--retention-days", type=int, default=settings.AUTH_AUDIT["RETENTION_DAYS"])
+
+    def handle(self, *args, **options):
+        for name in ensure_partitions(options["days_ahead"]):
+            self.stdout.write(f"Created partition {name}")
+
+        for name in drop_partitions(options["retention_days"]):
+            self.stdout.write(f"Dropped partition {name}")
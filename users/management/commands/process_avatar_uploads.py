@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.uploads import expire_uploads, process_pending_uploads
+
+
+class Command(BaseCommand):
+    help = "Проверяет собранные загрузки аватаров, создает миниатюры и удаляет брошенные загрузки"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10)
+        parser.add_argument("--interval", type=float, default=1.0, help="Пауза в секундах, если загрузок нет")
+        parser.add_argument(
+            "--expire-interval", type=float, default=600.0, help="Как часто в секундах удалять брошенные загрузки"
+        )
+        parser.add_argument("--once", action="store_true", help="Обработать накопившиеся загрузки и выйти")
+
+    def handle(self, *args, **options):
+        next_expiry = 0.0
+
+        while True:
+            if time.monotonic() >= next_expiry:
+                removed = expire_uploads(settings.AVATAR_UPLOAD_EXPIRY)
+                if removed:
+                    self.stdout.write(f"Removed {removed} stale avatar upload files")
+                next_expiry = time.monotonic() + options["expire_interval"]
+
+            processed = process_pending_uploads(batch_size=options["batch_size"])
+
+            if processed:
+                self.stdout.write(f"Processed {processed} avatar uploads")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
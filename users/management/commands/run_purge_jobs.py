@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.models import PurgeJob
+from users.purge import run_job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Выполняет задачи удаления и деактивации пользователей пачками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, default=5.0, help="Пауза в секундах, если задач нет")
+        parser.add_argument("--once", action="store_true", help="Выполнить накопившиеся задачи и выйти")
+
+    def handle(self, *args, **options):
+        while True:
+            job_ids = list(
+                PurgeJob.objects
+                .filter(status__in=[PurgeJob.PENDING, PurgeJob.RUNNING])
+                .order_by("created_at")
+                .values_list("pk", flat=True)
+            )
+            finished = 0
+
+            for job_id in job_ids:
+                try:
+                    if not run_job(job_id):
+                        continue
+                except Exception as e:
+                    # Задача уже помечена как failed, остальные продолжают выполняться
+                    logger.error("Purge job %s stopped: %s", job_id, e)
+                    self.stderr.write(f"Purge job {job_id} failed: {e}")
+                    continue
+
+                finished += 1
+                self.stdout.write(f"Purge job {job_id} finished")
+
+            # Если все задачи заняты другими процессами, не опрашиваем базу в цикле
+            if not finished:
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
@@ -0,0 +1,115 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:12
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.functions.text
+import users.models
+
+
+logger = logging.getLogger(__name__)
+
+
+CI_UNIQUE_FIELDS = (
+    ('username', 'users_customuser_username_ci_uniq'),
+    ('email', 'users_customuser_email_ci_uniq'),
+)
+
+
+def report_case_insensitive_conflicts(apps, schema_editor):
+    """
+    Перед построением уникальных индексов ищет пользователей, чьи username
+    или email совпадают без учета регистра, и прерывает миграцию со списком
+    конфликтующих строк, чтобы их можно было разобрать вручную.
+    """
+    CustomUser = apps.get_model('users', 'CustomUser')
+    conflicts = []
+
+    for field, _index_name in CI_UNIQUE_FIELDS:
+        duplicates = (
+            CustomUser.objects
+            .values(key=django.db.models.functions.text.Lower(field))
+            .annotate(total=Count('id'))
+            .filter(total__gt=1)
+            .values_list('key', flat=True)
+        )
+
+        for key in duplicates:
+            rows = list(
+                CustomUser.objects
+                .alias(key=django.db.models.functions.text.Lower(field))
+                .filter(key=key)
+                .order_by('id')
+                .values_list('id', field)
+            )
+            logger.error("Case-insensitive %s conflict: %s", field, rows)
+            conflicts.append(f"{field}={key!r}: {rows}")
+
+    if conflicts:
+        raise ValueError(
+            "Resolve case-insensitive duplicates before applying this migration:\n"
+            + "\n".join(conflicts)
+        )
+
+
+def create_index_concurrently(field, index_name):
+    # CREATE INDEX CONCURRENTLY не блокирует запись в таблицу, но может
+    # оставить невалидный индекс после сбоя, поэтому сначала удаляем его.
+    return migrations.RunSQL(
+        sql=[
+            f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"',
+            f'CREATE UNIQUE INDEX CONCURRENTLY "{index_name}" '
+            f'ON "users_customuser" ((LOWER("{field}")))',
+        ],
+        reverse_sql=f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"',
+    )
+
+
+class Migration(migrations.Migration):
+
+    # Индексы строятся CONCURRENTLY, что невозможно внутри транзакции.
+    atomic = False
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(report_case_insensitive_conflicts, migrations.RunPython.noop),
+        migrations.AlterModelManagers(
+            name='customuser',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=models.ImageField(blank=True, null=True, upload_to='avatars/', validators=[users.models.validate_avatar], verbose_name='Avatars'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='bio',
+            field=models.TextField(blank=True, null=True, verbose_name='Biography'),
+        ),
+        migrations.AlterField(
+            model_name='customuser',
+            name='email',
+            field=models.EmailField(max_length=254, unique=True, verbose_name='Email address'),
+        ),
+    ] + [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[create_index_concurrently(field, index_name)],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='customuser',
+                    constraint=models.UniqueConstraint(
+                        django.db.models.functions.text.Lower(field),
+                        name=index_name,
+                    ),
+                ),
+            ],
+        )
+        for field, index_name in CI_UNIQUE_FIELDS
+    ]
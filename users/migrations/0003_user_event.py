@@ -0,0 +1,33 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:15
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_case_insensitive_identity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('registered', 'Registered'), ('updated', 'Updated'), ('deactivated', 'Deactivated')], max_length=32, verbose_name='Event type')),
+                ('user_id', models.BigIntegerField(verbose_name='User ID')),
+                ('payload', models.JSONField(default=dict, verbose_name='Payload')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('dispatched_at', models.DateTimeField(blank=True, null=True, verbose_name='Dispatched at')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next attempt at')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Last error')),
+            ],
+            options={
+                'verbose_name': 'User event',
+                'verbose_name_plural': 'User events',
+                'indexes': [models.Index(condition=models.Q(('dispatched_at__isnull', True)), fields=['next_attempt_at', 'id'], name='users_event_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='avatar_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='avatars/thumbnails/', verbose_name='Avatar thumbnail'),
+        ),
+        migrations.CreateModel(
+            name='AvatarUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='File name')),
+                ('size', models.PositiveIntegerField(verbose_name='Size')),
+                ('checksum', models.CharField(max_length=64, verbose_name='Checksum')),
+                ('offset', models.PositiveIntegerField(default=0, verbose_name='Offset')),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('assembled', 'Assembled'), ('ready', 'Ready'), ('failed', 'Failed')], default='uploading', max_length=16, verbose_name='Status')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='avatar_uploads', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Avatar upload',
+                'verbose_name_plural': 'Avatar uploads',
+                'indexes': [models.Index(condition=models.Q(('status', 'assembled')), fields=['updated_at'], name='users_avatar_upload_queue_idx')],
+            },
+        ),
+    ]
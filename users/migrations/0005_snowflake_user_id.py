@@ -0,0 +1,19 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:20
+
+from django.db import migrations
+import users.snowflake
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_avatar_upload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='id',
+            field=users.snowflake.SnowflakeField(primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_snowflake_user_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='profile_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Profile version'),
+        ),
+    ]
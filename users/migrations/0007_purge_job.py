@@ -0,0 +1,39 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_profile_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurgeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(choices=[('delete', 'Delete'), ('deactivate', 'Deactivate')], max_length=16, verbose_name='Action')),
+                ('user_ids', models.JSONField(default=list, verbose_name='User IDs')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16, verbose_name='Status')),
+                ('cursor', models.BigIntegerField(default=-1, verbose_name='Cursor')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processed')),
+                ('pending_files', models.JSONField(blank=True, default=list, verbose_name='Pending files')),
+                ('batch_size', models.PositiveIntegerField(default=500, verbose_name='Batch size')),
+                ('max_rows_per_second', models.PositiveIntegerField(default=1000, verbose_name='Max rows per second')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created at')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished at')),
+            ],
+            options={
+                'verbose_name': 'Purge job',
+                'verbose_name_plural': 'Purge jobs',
+            },
+        ),
+        migrations.AlterField(
+            model_name='userevent',
+            name='event_type',
+            field=models.CharField(choices=[('registered', 'Registered'), ('updated', 'Updated'), ('deactivated', 'Deactivated'), ('deleted', 'Deleted')], max_length=32, verbose_name='Event type'),
+        ),
+    ]
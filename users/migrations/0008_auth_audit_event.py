@@ -0,0 +1,72 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:26
+
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.db import migrations, models
+from django.utils import timezone
+import users.snowflake
+
+
+CREATE_AUDIT_TABLE = [
+    '''
+    CREATE TABLE "users_authauditevent" (
+        "id" bigint NOT NULL,
+        "created_at" timestamp with time zone NOT NULL,
+        "event_type" varchar(32) NOT NULL,
+        "username" varchar(150) NOT NULL,
+        "ip" inet NULL,
+        "reason" text NOT NULL,
+        PRIMARY KEY ("id", "created_at")
+    ) PARTITION BY RANGE ("created_at")
+    ''',
+    # Страховка на случай, если секция на нужный день еще не создана
+    'CREATE TABLE "users_authauditevent_default" PARTITION OF "users_authauditevent" DEFAULT',
+    'CREATE INDEX "users_authaudit_ip_idx" ON "users_authauditevent" ("ip", "created_at")',
+    'CREATE INDEX "users_authaudit_username_idx" ON "users_authauditevent" ("username", "created_at")',
+]
+
+
+def create_partitions(apps, schema_editor):
+    # Секции на сегодня и два дня вперед (по UTC); дальше их создает
+    # manage_audit_partitions. Таблица только что создана, поэтому DEFAULT-секция
+    # пуста и секции можно создавать сразу через PARTITION OF
+    today = timezone.now().astimezone(dt_timezone.utc).date()
+
+    with schema_editor.connection.cursor() as cursor:
+        for offset in range(3):
+            day = today + timedelta(days=offset)
+            start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+            cursor.execute(
+                f'CREATE TABLE "users_authauditevent_p{day:%Y%m%d}" PARTITION OF "users_authauditevent" '
+                'FOR VALUES FROM (%s) TO (%s)',
+                [start, start + timedelta(days=1)],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_purge_job'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_AUDIT_TABLE, reverse_sql='DROP TABLE "users_authauditevent"'),
+        migrations.RunPython(create_partitions, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='AuthAuditEvent',
+            fields=[
+                ('id', users.snowflake.SnowflakeField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Created at')),
+                ('event_type', models.CharField(choices=[('login_failed', 'Login failed'), ('register_rejected', 'Registration rejected')], max_length=32, verbose_name='Event type')),
+                ('username', models.CharField(blank=True, max_length=150, verbose_name='Username')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP address')),
+                ('reason', models.TextField(blank=True, verbose_name='Reason')),
+            ],
+            options={
+                'verbose_name': 'Authentication audit event',
+                'verbose_name_plural': 'Authentication audit events',
+                'db_table': 'users_authauditevent',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_auth_audit_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnowflakeWorkerLease',
+            fields=[
+                ('worker_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name='Worker ID')),
+                ('owner', models.CharField(max_length=128, verbose_name='Owner')),
+                ('expires_at', models.DateTimeField(verbose_name='Expires at')),
+            ],
+            options={
+                'verbose_name': 'Snowflake worker lease',
+                'verbose_name_plural': 'Snowflake worker leases',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.17 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_snowflake_worker_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='purgejob',
+            name='next_batch_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Next batch at'),
+        ),
+    ]
@@ -1,19 +1,30 @@
 import logging
-from typing import Any, Optional
+import os
+import uuid
+from typing import Any, Iterable, Optional
 
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import UserManager
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import EmailValidator
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError
 from django.core.files.images import get_image_dimensions
 
+from users.claims import cache_profile_version
+from users.snowflake import SnowflakeField
+
 
 logger = logging.getLogger(__name__)
 
 
+AVATAR_MAX_SIZE = 5 * 1024 * 1024
+
+
 def validate_avatar(image) -> None:
     """
     Валидатор для проверки аватара.
@@ -22,9 +33,7 @@ def validate_avatar(image) -> None:
     max_width = 800
     max_height = 800
 
-    max_image_size = 5 * 1024 * 1024
-
-    if image.size > max_image_size:
+    if image.size > AVATAR_MAX_SIZE:
         logger.error('Avatar file size must not exceed 5MB')
         raise ValidationError(_("Avatar file size must not exceed 5MB"))
 
@@ -60,6 +69,28 @@ class CustomUserManager(UserManager):
             logger.error('Invalid email address')
             raise ValueError(_("Invalid email address")) from e
 
+    def filter_case_insensitive(self, **fields: str) -> models.QuerySet:
+        """
+        Возвращает пользователей, у которых хотя бы одно из полей совпадает
+        с переданным значением без учета регистра.
+
+        Сравнение идет через LOWER(поле), поэтому запрос обслуживается
+        функциональными уникальными индексами, а не последовательным сканированием.
+
+        Параметры:
+        - **fields: Имя поля и искомое значение, например username="Alice".
+        """
+
+        condition = models.Q()
+        aliases = {}
+
+        for field, value in fields.items():
+            alias = f"{field}_lower"
+            aliases[alias] = Lower(field)
+            condition |= models.Q(**{alias: Lower(models.Value(value))})
+
+        return self.get_queryset().alias(**aliases).filter(condition)
+
     def create_user(
         self,
         username: str,
@@ -138,10 +169,14 @@ class CustomUser(AbstractUser):
     Модель пользователя с дополнительными полями: аватар и биография.
 
     Атрибуты:
+    id: Упорядоченный по времени 64-битный идентификатор (SnowflakeField).
     avatar: Поле для изображения аватара пользователя.
+    avatar_thumbnail: Уменьшенная копия аватара, создается после загрузки.
     bio: Поле для биографии пользователя.
+    profile_version: Растет при изменении полей, попадающих в JWT (CLAIM_FIELDS).
     """
 
+    id = SnowflakeField(primary_key=True, verbose_name="ID")
     avatar = models.ImageField(
         _("Avatars"),
         upload_to="avatars/",
@@ -149,10 +184,382 @@ class CustomUser(AbstractUser):
         blank=True,
         validators=[validate_avatar],
     )
+    avatar_thumbnail = models.ImageField(
+        _("Avatar thumbnail"),
+        upload_to="avatars/thumbnails/",
+        null=True,
+        blank=True,
+        editable=False,
+    )
     bio = models.TextField(_("Biography"), null=True, blank=True)  # type: ignore[var-annotated]
     email = models.EmailField(_("Email address"), unique=True, blank=False, null=False)
+    profile_version = models.PositiveIntegerField(_("Profile version"), default=0, editable=False)
 
     objects = CustomUserManager()
 
+    # Поля, изменение которых публикуется в UserEvent
+    EVENT_TRACKED_FIELDS = ("username", "email", "first_name", "last_name", "avatar", "bio", "is_active")
+
+    # Поля, которые передаются в JWT в режиме JWT_PROFILE_CLAIMS
+    CLAIM_FIELDS = ("username", "is_active", "is_staff")
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            models.UniqueConstraint(Lower("username"), name="users_customuser_username_ci_uniq"),
+            models.UniqueConstraint(Lower("email"), name="users_customuser_email_ci_uniq"),
+        ]
+
     def __str__(self) -> str:
         return self.username
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._event_snapshot = instance._tracked_values()
+        return instance
+
+    def _tracked_values(self) -> dict[str, Any]:
+        deferred = self.get_deferred_fields()
+        values = {}
+
+        for name in dict.fromkeys(self.EVENT_TRACKED_FIELDS + self.CLAIM_FIELDS):
+            if name in deferred:
+                continue
+            value = getattr(self, name)
+            values[name] = value.name if isinstance(value, models.fields.files.FieldFile) else value
+
+        return values
+
+    def _changed_fields(self, update_fields: Optional[Iterable[str]] = None) -> list[str]:
+        previous = getattr(self, "_event_snapshot", {})
+        current = self._tracked_values()
+        saved = set(update_fields) if update_fields is not None else current.keys()
+
+        return [
+            name for name, value in current.items()
+            if name in saved and name in previous and previous[name] != value
+        ]
+
+    def _lifecycle_event(
+        self, created: bool, update_fields: Optional[Iterable[str]] = None
+    ) -> Optional[tuple[str, list[str]]]:
+        if created:
+            return UserEvent.REGISTERED, []
+
+        changed = [name for name in self._changed_fields(update_fields) if name in self.EVENT_TRACKED_FIELDS]
+
+        if not changed:
+            return None
+
+        if "is_active" in changed and not self.is_active:
+            return UserEvent.DEACTIVATED, changed
+
+        return UserEvent.UPDATED, changed
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        """
+        Сохраняет пользователя и в той же транзакции записывает событие
+        жизненного цикла в outbox (UserEvent). При изменении CLAIM_FIELDS
+        увеличивает profile_version, чтобы старые JWT-claims стали недействительны.
+
+        Массовые операции (QuerySet.update, bulk_create) событий не создают.
+        """
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+
+        with transaction.atomic(using=using):
+            created = self._state.adding
+            update_fields = kwargs.get("update_fields")
+            claims_changed = not created and any(
+                name in self.CLAIM_FIELDS for name in self._changed_fields(update_fields)
+            )
+
+            if claims_changed:
+                # Инкремент в базе, чтобы параллельные сохранения не выдали одну версию
+                self.profile_version = models.F("profile_version") + 1
+                if update_fields is not None:
+                    kwargs["update_fields"] = {*update_fields, "profile_version"}
+
+            super().save(*args, **kwargs)
+
+            if claims_changed:
+                self.refresh_from_db(using=using, fields=["profile_version"])
+                version = self.profile_version
+                transaction.on_commit(lambda: cache_profile_version(self.pk, version), using=using)
+
+            event = self._lifecycle_event(created, update_fields)
+
+            if event is not None:
+                event_type, changed = event
+                UserEvent.objects.using(using).create(
+                    event_type=event_type,
+                    user_id=self.pk,
+                    payload={
+                        "username": self.username,
+                        "email": self.email,
+                        "is_active": self.is_active,
+                        "changed": changed,
+                    },
+                )
+
+        self._event_snapshot = self._tracked_values()
+
+
+class UserEvent(models.Model):
+    """
+    Событие жизненного цикла пользователя (transactional outbox).
+
+    Пишется в одной транзакции с изменением CustomUser и доставляется
+    во внешние системы фоновым процессом dispatch_user_events.
+
+    Атрибуты:
+    event_type: Тип события.
+    user_id: Идентификатор пользователя (без внешнего ключа, чтобы событие пережило удаление).
+    payload: Данные события.
+    created_at: Время создания события.
+    dispatched_at: Время успешной доставки, пустое для ожидающих событий.
+    attempts: Количество неудачных попыток доставки.
+    next_attempt_at: Время следующей попытки доставки.
+    last_error: Текст последней ошибки доставки.
+    """
+
+    REGISTERED = "registered"
+    UPDATED = "updated"
+    DEACTIVATED = "deactivated"
+    DELETED = "deleted"
+
+    EVENT_TYPES = (
+        (REGISTERED, _("Registered")),
+        (UPDATED, _("Updated")),
+        (DEACTIVATED, _("Deactivated")),
+        (DELETED, _("Deleted")),
+    )
+
+    event_type = models.CharField(_("Event type"), max_length=32, choices=EVENT_TYPES)
+    user_id = models.BigIntegerField(_("User ID"))
+    payload = models.JSONField(_("Payload"), default=dict)
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    dispatched_at = models.DateTimeField(_("Dispatched at"), null=True, blank=True)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    next_attempt_at = models.DateTimeField(_("Next attempt at"), default=timezone.now)
+    last_error = models.TextField(_("Last error"), blank=True, default="")
+
+    class Meta:
+        verbose_name = _("User event")
+        verbose_name_plural = _("User events")
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                name="users_event_pending_idx",
+                condition=models.Q(dispatched_at__isnull=True),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.event_type} #{self.user_id}"
+
+    def as_message(self) -> dict[str, Any]:
+        return {
+            "id": self.pk,
+            "type": self.event_type,
+            "user_id": str(self.user_id),
+            "payload": self.payload,
+            "created_at": self.created_at.isoformat(),
+        }
+
+
+class AvatarUpload(models.Model):
+    """
+    Возобновляемая загрузка аватара частями.
+
+    Части пишутся во временный файл по смещению, после получения всех байт
+    проверяется контрольная сумма, а валидация и создание миниатюры
+    выполняются фоновым процессом process_avatar_uploads.
+
+    Атрибуты:
+    user: Пользователь, загружающий аватар.
+    filename: Исходное имя файла.
+    size: Ожидаемый размер файла в байтах.
+    checksum: Ожидаемая SHA-256 сумма файла (hex).
+    offset: Количество уже полученных байт.
+    status: Состояние загрузки.
+    error: Причина ошибки для статуса failed.
+    """
+
+    UPLOADING = "uploading"
+    ASSEMBLED = "assembled"
+    READY = "ready"
+    FAILED = "failed"
+
+    STATUSES = (
+        (UPLOADING, _("Uploading")),
+        (ASSEMBLED, _("Assembled")),
+        (READY, _("Ready")),
+        (FAILED, _("Failed")),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="avatar_uploads",
+        verbose_name=_("User"),
+    )
+    filename = models.CharField(_("File name"), max_length=255)
+    size = models.PositiveIntegerField(_("Size"))
+    checksum = models.CharField(_("Checksum"), max_length=64)
+    offset = models.PositiveIntegerField(_("Offset"), default=0)
+    status = models.CharField(_("Status"), max_length=16, choices=STATUSES, default=UPLOADING)
+    error = models.TextField(_("Error"), blank=True, default="")
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    updated_at = models.DateTimeField(_("Updated at"), auto_now=True)
+
+    class Meta:
+        verbose_name = _("Avatar upload")
+        verbose_name_plural = _("Avatar uploads")
+        indexes = [
+            models.Index(
+                fields=["updated_at"],
+                name="users_avatar_upload_queue_idx",
+                condition=models.Q(status="assembled"),
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.filename} ({self.status})"
+
+    @property
+    def part_path(self) -> str:
+        return os.path.join(settings.AVATAR_UPLOAD_TMP_DIR, f"{self.pk}.part")
+
+
+class PurgeJob(models.Model):
+    """
+    Фоновое удаление или деактивация группы пользователей.
+
+    Обрабатывается командой run_purge_jobs пачками по batch_size пользователей
+    в порядке возрастания id. После каждой пачки в той же транзакции
+    сохраняется cursor, поэтому после сбоя работа продолжается с места остановки.
+    Темп хранится в самой задаче (next_batch_at), поэтому max_rows_per_second
+    соблюдается при любом числе обработчиков.
+
+    Атрибуты:
+    action: Удаление или деактивация.
+    user_ids: Идентификаторы пользователей.
+    status: Состояние задачи.
+    cursor: Наибольший обработанный id пользователя.
+    processed: Количество обработанных пользователей.
+    pending_files: Файлы аватаров удаленных пользователей, которые еще нужно удалить из хранилища.
+    batch_size: Размер пачки.
+    max_rows_per_second: Ограничение скорости, чтобы не увеличивать отставание реплик.
+    next_batch_at: Время, раньше которого следующую пачку не начинать.
+    error: Текст ошибки для статуса failed.
+    """
+
+    DELETE = "delete"
+    DEACTIVATE = "deactivate"
+
+    ACTIONS = (
+        (DELETE, _("Delete")),
+        (DEACTIVATE, _("Deactivate")),
+    )
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    STATUSES = (
+        (PENDING, _("Pending")),
+        (RUNNING, _("Running")),
+        (DONE, _("Done")),
+        (FAILED, _("Failed")),
+    )
+
+    action = models.CharField(_("Action"), max_length=16, choices=ACTIONS)
+    user_ids = models.JSONField(_("User IDs"), default=list)
+    status = models.CharField(_("Status"), max_length=16, choices=STATUSES, default=PENDING)
+    cursor = models.BigIntegerField(_("Cursor"), default=-1)
+    processed = models.PositiveIntegerField(_("Processed"), default=0)
+    pending_files = models.JSONField(_("Pending files"), default=list, blank=True)
+    batch_size = models.PositiveIntegerField(_("Batch size"), default=500)
+    max_rows_per_second = models.PositiveIntegerField(_("Max rows per second"), default=1000)
+    next_batch_at = models.DateTimeField(_("Next batch at"), null=True, blank=True)
+    error = models.TextField(_("Error"), blank=True, default="")
+    created_at = models.DateTimeField(_("Created at"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("Finished at"), null=True, blank=True)
+
+    class Meta:
+        verbose_name = _("Purge job")
+        verbose_name_plural = _("Purge jobs")
+
+    def __str__(self) -> str:
+        return f"{self.action} {len(self.user_ids)} users ({self.status})"
+
+    def save(self, *args: Any, **kwargs: Any) -> None:
+        # Пачки выбираются бинарным поиском по курсору; после создания список не меняется
+        if self._state.adding:
+            self.user_ids = sorted(set(self.user_ids))
+        super().save(*args, **kwargs)
+
+
+class AuthAuditEvent(models.Model):
+    """
+    Событие аудита аутентификации: неудачный вход или отклоненная регистрация.
+
+    Таблица секционирована по дням (RANGE по created_at) и создается
+    миграцией вручную, поэтому managed = False. Секции создает и удаляет
+    команда manage_audit_partitions, записи пишутся пачками через COPY (users.audit).
+
+    Атрибуты:
+    created_at: Время события (ключ секционирования).
+    event_type: Тип события.
+    username: Идентификатор из запроса в нижнем регистре.
+    ip: IP-адрес клиента.
+    reason: Причина отказа.
+    """
+
+    LOGIN_FAILED = "login_failed"
+    REGISTER_REJECTED = "register_rejected"
+
+    EVENT_TYPES = (
+        (LOGIN_FAILED, _("Login failed")),
+        (REGISTER_REJECTED, _("Registration rejected")),
+    )
+
+    id = SnowflakeField(primary_key=True, verbose_name="ID")
+    created_at = models.DateTimeField(_("Created at"))
+    event_type = models.CharField(_("Event type"), max_length=32, choices=EVENT_TYPES)
+    username = models.CharField(_("Username"), max_length=150, blank=True)
+    ip = models.GenericIPAddressField(_("IP address"), null=True, blank=True)
+    reason = models.TextField(_("Reason"), blank=True)
+
+    class Meta:
+        managed = False
+        db_table = "users_authauditevent"
+        verbose_name = _("Authentication audit event")
+        verbose_name_plural = _("Authentication audit events")
+
+    def __str__(self) -> str:
+        return f"{self.event_type} {self.username} {self.ip}"
+
+
+class SnowflakeWorkerLease(models.Model):
+    """
+    Аренда worker id для SnowflakeField (users.snowflake.WorkerLease).
+
+    Атрибуты:
+    worker_id: Номер процесса 0..1023.
+    owner: Хост, pid и случайный суффикс процесса-арендатора.
+    expires_at: Время окончания аренды, продлевается арендатором.
+    """
+
+    worker_id = models.PositiveSmallIntegerField(_("Worker ID"), primary_key=True)
+    owner = models.CharField(_("Owner"), max_length=128)
+    expires_at = models.DateTimeField(_("Expires at"))
+
+    class Meta:
+        verbose_name = _("Snowflake worker lease")
+        verbose_name_plural = _("Snowflake worker leases")
+
+    def __str__(self) -> str:
+        return f"{self.worker_id} {self.owner}"
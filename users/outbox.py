@@ -0,0 +1,238 @@
+import json
+import logging
+import queue
+import time
+import urllib.request
+from collections import defaultdict
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from users.models import UserEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventSink:
+    """
+    Базовый приемник событий. send() получает пачку сообщений и должен
+    выбросить исключение, если доставка не удалась — тогда вся пачка
+    будет отправлена повторно (at-least-once, потребители дедуплицируют по id).
+    """
+
+    def send(self, messages: list[dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+
+class FileSink(EventSink):
+    """
+    Дописывает события в файл в формате JSON Lines.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = Path(path)
+
+    def send(self, messages: list[dict[str, Any]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        with self.path.open("a", encoding="utf-8") as file:
+            for message in messages:
+                file.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+
+class HttpSink(EventSink):
+    """
+    Отправляет пачку событий POST-запросом с JSON-телом {"events": [...]}.
+    """
+
+    def __init__(self, url: str, timeout: float = 5.0, headers: Optional[dict[str, str]] = None) -> None:
+        self.url = url
+        self.timeout = timeout
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+
+    def send(self, messages: list[dict[str, Any]]) -> None:
+        body = json.dumps({"events": messages}).encode()
+        request = urllib.request.Request(self.url, data=body, headers=self.headers, method="POST")
+
+        # urlopen выбрасывает HTTPError на ответы 4xx/5xx
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class QueueSink(EventSink):
+    """
+    Кладет события в локальную очередь процесса — замена брокеру
+    сообщений для разработки и тестов.
+    """
+
+    queue: "queue.Queue[dict[str, Any]]" = queue.Queue()
+
+    def send(self, messages: list[dict[str, Any]]) -> None:
+        for message in messages:
+            self.queue.put(message)
+
+
+def load_sinks() -> list[EventSink]:
+    """
+    Создает приемники из настройки USER_EVENT_SINKS
+    (список словарей с ключами BACKEND и OPTIONS).
+    """
+    return [
+        import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        for config in settings.USER_EVENT_SINKS
+    ]
+
+
+class OutboxDispatcher:
+    """
+    Доставляет события из outbox пачками.
+
+    Пачка захватывается через SELECT ... FOR UPDATE SKIP LOCKED в короткой
+    транзакции: next_attempt_at сдвигается на claim_timeout секунд, и транзакция
+    фиксируется до обращения к приемникам, поэтому сетевые вызовы не держат
+    блокировки. Если диспетчер упадет, события снова станут доступны через
+    claim_timeout. При ошибке доставки попытка откладывается с экспоненциальной
+    задержкой. Доставленные события хранятся retention и затем удаляются.
+    """
+
+    def __init__(
+        self,
+        sinks: Optional[list[EventSink]] = None,
+        batch_size: int = 100,
+        retry_base: float = 1.0,
+        retry_max: float = 300.0,
+        claim_timeout: float = 60.0,
+        retention: Optional[timedelta] = None,
+    ) -> None:
+        self.sinks = load_sinks() if sinks is None else sinks
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_timeout = claim_timeout
+        self.retention = retention if retention is not None else timedelta(days=settings.USER_EVENT_RETENTION_DAYS)
+
+        self.dispatched = 0
+        self.failed = 0
+        self.last_delivery_lag = 0.0
+
+    def backoff(self, attempts: int) -> timedelta:
+        return timedelta(seconds=min(self.retry_base * 2 ** attempts, self.retry_max))
+
+    def dispatch_batch(self) -> int:
+        """
+        Захватывает и доставляет одну пачку событий.
+        Возвращает количество захваченных событий.
+        """
+        with transaction.atomic():
+            now = timezone.now()
+            events = list(
+                UserEvent.objects
+                .select_for_update(skip_locked=True)
+                .filter(dispatched_at__isnull=True, next_attempt_at__lte=now)
+                .order_by("next_attempt_at", "id")[:self.batch_size]
+            )
+
+            if not events:
+                return 0
+
+            ids = [event.pk for event in events]
+            UserEvent.objects.filter(pk__in=ids).update(
+                next_attempt_at=now + timedelta(seconds=self.claim_timeout)
+            )
+
+        messages = [event.as_message() for event in events]
+
+        try:
+            for sink in self.sinks:
+                sink.send(messages)
+        except Exception as e:
+            logger.error("Failed to dispatch %s user events: %s", len(events), e)
+            self.failed += len(events)
+
+            by_attempts = defaultdict(list)
+            for event in events:
+                by_attempts[event.attempts].append(event.pk)
+
+            for attempts, group in by_attempts.items():
+                UserEvent.objects.filter(pk__in=group).update(
+                    attempts=F("attempts") + 1,
+                    next_attempt_at=timezone.now() + self.backoff(attempts),
+                    last_error=str(e)[:1000],
+                )
+            return len(events)
+
+        delivered_at = timezone.now()
+        UserEvent.objects.filter(pk__in=ids).update(dispatched_at=delivered_at)
+
+        self.dispatched += len(events)
+        self.last_delivery_lag = (delivered_at - min(event.created_at for event in events)).total_seconds()
+        return len(events)
+
+    def delete_dispatched(self, chunk_size: int = 1000) -> int:
+        """
+        Удаляет события, доставленные раньше чем retention назад, пачками по chunk_size.
+        Возвращает количество удаленных событий.
+        """
+        cutoff = timezone.now() - self.retention
+        deleted = 0
+
+        while True:
+            ids = list(
+                UserEvent.objects
+                .filter(dispatched_at__lt=cutoff)
+                .values_list("pk", flat=True)[:chunk_size]
+            )
+
+            if not ids:
+                break
+
+            deleted += UserEvent.objects.filter(pk__in=ids).delete()[0]
+
+        if deleted:
+            logger.info("Deleted %s dispatched user events", deleted)
+
+        return deleted
+
+    def pending_lag(self) -> float:
+        """
+        Возраст самого старого недоставленного события в секундах.
+        """
+        oldest = UserEvent.objects.filter(dispatched_at__isnull=True).aggregate(oldest=Min("created_at"))["oldest"]
+        return (timezone.now() - oldest).total_seconds() if oldest else 0.0
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "dispatched": self.dispatched,
+            "failed": self.failed,
+            "last_delivery_lag": self.last_delivery_lag,
+            "pending": UserEvent.objects.filter(dispatched_at__isnull=True).count(),
+            "pending_lag": self.pending_lag(),
+        }
+
+    def run(self, interval: float = 1.0, once: bool = False, cleanup_interval: float = 3600.0) -> None:
+        """
+        Доставляет события до тех пор, пока процесс не будет остановлен.
+        Если событий нет, ждет interval секунд. Раз в cleanup_interval секунд
+        удаляет старые доставленные события.
+        """
+        next_cleanup = 0.0
+
+        while True:
+            if time.monotonic() >= next_cleanup:
+                self.delete_dispatched()
+                next_cleanup = time.monotonic() + cleanup_interval
+
+            claimed = self.dispatch_batch()
+
+            if claimed:
+                logger.info("User events dispatch: %s", self.metrics())
+            elif once:
+                return
+            else:
+                time.sleep(interval)
@@ -0,0 +1,101 @@
+import math
+import threading
+import time
+from functools import lru_cache
+from typing import Iterable
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+
+class PresenceBackend:
+    """
+    Базовое хранилище присутствия. heartbeat() отмечает пользователя
+    как активного, online() возвращает активных из переданных id.
+    """
+
+    def heartbeat(self, user_id: int) -> None:
+        raise NotImplementedError
+
+    def online(self, user_ids: Iterable[int]) -> set[int]:
+        raise NotImplementedError
+
+    def is_online(self, user_id: int) -> bool:
+        return user_id in self.online([user_id])
+
+
+class LocalPresenceBackend(PresenceBackend):
+    """
+    Присутствие в памяти процесса: кольцо из множеств id по интервалам
+    bucket_seconds. Пользователь онлайн, если он присылал heartbeat в одном
+    из интервалов за последние ttl секунд. Устаревший интервал очищается
+    целиком при повторном использовании ячейки кольца.
+
+    Вместо битовых карт используются множества: Snowflake-идентификаторы
+    64-битные и разреженные, битовая карта по ним не была бы компактной.
+
+    Подходит для одного процесса и тестов; для нескольких процессов
+    используйте CachePresenceBackend.
+    """
+
+    def __init__(self, ttl: int = 120, bucket_seconds: int = 30) -> None:
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = math.ceil(ttl / bucket_seconds) + 1
+        self._buckets: list[set[int]] = [set() for _ in range(self.bucket_count)]
+        self._epochs = [-1] * self.bucket_count
+        self._lock = threading.Lock()
+
+    def _current_epoch(self) -> int:
+        return int(time.time() // self.bucket_seconds)
+
+    def heartbeat(self, user_id: int) -> None:
+        epoch = self._current_epoch()
+        index = epoch % self.bucket_count
+
+        if self._epochs[index] != epoch:
+            with self._lock:
+                if self._epochs[index] != epoch:
+                    self._buckets[index] = set()
+                    self._epochs[index] = epoch
+
+        self._buckets[index].add(user_id)
+
+    def online(self, user_ids: Iterable[int]) -> set[int]:
+        oldest = self._current_epoch() - self.bucket_count + 1
+        requested = set(user_ids)
+        online: set[int] = set()
+
+        for bucket, epoch in zip(self._buckets, self._epochs):
+            if epoch >= oldest:
+                # Пересечение множеств обходит меньшее из них
+                online |= requested.intersection(bucket)
+
+        return online
+
+
+class CachePresenceBackend(PresenceBackend):
+    """
+    Присутствие в общем кеше Django (например, Redis или Memcached):
+    один ключ на пользователя с временем жизни ttl, проверка пачкой через get_many.
+    """
+
+    def __init__(self, alias: str = "default", ttl: int = 120) -> None:
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def heartbeat(self, user_id: int) -> None:
+        self.cache.set(f"presence:{user_id}", 1, timeout=self.ttl)
+
+    def online(self, user_ids: Iterable[int]) -> set[int]:
+        keys = {f"presence:{user_id}": user_id for user_id in user_ids}
+        return {keys[key] for key in self.cache.get_many(keys)}
+
+
+@lru_cache(maxsize=None)
+def get_presence_backend() -> PresenceBackend:
+    """
+    Создает хранилище из настройки PRESENCE_BACKEND (словарь с ключами BACKEND и OPTIONS).
+    """
+    config = settings.PRESENCE_BACKEND
+    return import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
@@ -0,0 +1,186 @@
+import bisect
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from users.claims import forget_profile_versions
+from users.models import CustomUser, PurgeJob, UserEvent
+
+logger = logging.getLogger(__name__)
+
+
+def replication_lag() -> float:
+    """
+    Наибольшее отставание реплик в секундах по pg_stat_replication
+    (0, если реплик нет или нет прав на просмотр).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(MAX(EXTRACT(EPOCH FROM replay_lag)), 0) FROM pg_stat_replication"
+        )
+        return float(cursor.fetchone()[0])
+
+
+def delete_files(names: list[str]) -> None:
+    """
+    Удаляет файлы из хранилища параллельно в PURGE_FILE_WORKERS потоков.
+    """
+    if not names:
+        return
+
+    with ThreadPoolExecutor(max_workers=settings.PURGE_FILE_WORKERS) as executor:
+        list(executor.map(default_storage.delete, names))
+
+
+def _deactivate(user_ids: list[int]) -> None:
+    users = list(
+        CustomUser.objects
+        .filter(pk__in=user_ids, is_active=True)
+        .values_list("pk", "username", "email")
+    )
+    active_ids = [pk for pk, _username, _email in users]
+
+    CustomUser.objects.filter(pk__in=active_ids).update(
+        is_active=False,
+        profile_version=F("profile_version") + 1,
+    )
+    UserEvent.objects.bulk_create([
+        UserEvent(
+            event_type=UserEvent.DEACTIVATED,
+            user_id=pk,
+            payload={"username": username, "email": email, "is_active": False, "changed": ["is_active"]},
+        )
+        for pk, username, email in users
+    ])
+
+
+def _delete(user_ids: list[int]) -> list[str]:
+    users = list(
+        CustomUser.objects
+        .filter(pk__in=user_ids)
+        .values_list("pk", "username", "email", "avatar", "avatar_thumbnail")
+    )
+    files = [name for *_fields, avatar, thumbnail in users for name in (avatar, thumbnail) if name]
+
+    # Связанные строки (groups, user_permissions, avatar_uploads, ...)
+    # удаляются запросами вида DELETE ... WHERE customuser_id IN (...)
+    CustomUser.objects.filter(pk__in=user_ids).delete()
+
+    UserEvent.objects.bulk_create([
+        UserEvent(
+            event_type=UserEvent.DELETED,
+            user_id=pk,
+            payload={"username": username, "email": email, "is_active": False, "changed": []},
+        )
+        for pk, username, email, _avatar, _thumbnail in users
+    ])
+    return files
+
+
+def run_batch(job_id: int) -> Optional[PurgeJob]:
+    """
+    Обрабатывает одну пачку задачи и сохраняет курсор и время следующей пачки
+    в той же транзакции. Возвращает задачу или None, если она занята другим
+    процессом, завершена или следующая пачка еще не наступила.
+    """
+    with transaction.atomic():
+        started = timezone.now()
+        job = (
+            PurgeJob.objects
+            .select_for_update(skip_locked=True)
+            .filter(pk=job_id, status__in=[PurgeJob.PENDING, PurgeJob.RUNNING])
+            .filter(Q(next_batch_at__isnull=True) | Q(next_batch_at__lte=started))
+            .first()
+        )
+
+        if job is None:
+            return None
+
+        # Файлы, оставшиеся от пачки до сбоя
+        delete_files(job.pending_files)
+
+        start = bisect.bisect_right(job.user_ids, job.cursor)
+        batch = job.user_ids[start:start + job.batch_size]
+        job.status = PurgeJob.RUNNING
+        job.pending_files = []
+
+        if batch:
+            if job.action == PurgeJob.DEACTIVATE:
+                _deactivate(batch)
+            else:
+                job.pending_files = _delete(batch)
+
+            job.cursor = batch[-1]
+            job.processed += len(batch)
+            job.next_batch_at = started + timedelta(seconds=len(batch) / job.max_rows_per_second)
+        else:
+            job.status = PurgeJob.DONE
+            job.finished_at = timezone.now()
+
+        job.save(update_fields=["status", "cursor", "processed", "pending_files", "next_batch_at", "finished_at"])
+        transaction.on_commit(lambda: forget_profile_versions(batch))
+
+    if job.pending_files:
+        delete_files(job.pending_files)
+        PurgeJob.objects.filter(pk=job.pk).update(pending_files=[])
+        job.pending_files = []
+
+    return job
+
+
+def _seconds_until(moment: Optional[datetime]) -> float:
+    return (moment - timezone.now()).total_seconds() if moment is not None else 0.0
+
+
+def run_job(job_id: int) -> bool:
+    """
+    Выполняет задачу, выдерживая max_rows_per_second (общий для всех обработчиков)
+    и приостанавливаясь, пока отставание реплик больше PURGE_MAX_REPLICATION_LAG.
+
+    Возвращает True, если задача завершена, и False, если пачку сейчас
+    обрабатывает другой процесс. При ошибке задача помечается как failed,
+    а исключение пробрасывается.
+    """
+    while True:
+        lag = replication_lag()
+
+        if lag > settings.PURGE_MAX_REPLICATION_LAG:
+            logger.warning("Replication lag %.1fs, purge job %s paused", lag, job_id)
+            time.sleep(lag)
+            continue
+
+        try:
+            job = run_batch(job_id)
+        except Exception as e:
+            logger.error("Purge job %s failed: %s", job_id, e)
+            PurgeJob.objects.filter(pk=job_id).update(status=PurgeJob.FAILED, error=str(e)[:1000])
+            raise
+
+        if job is None:
+            state = PurgeJob.objects.filter(pk=job_id).values("status", "next_batch_at").first()
+
+            if state is None or state["status"] not in (PurgeJob.PENDING, PurgeJob.RUNNING):
+                return True
+
+            delay = _seconds_until(state["next_batch_at"])
+
+            if delay <= 0:
+                # Пачка уже выполняется в другом процессе
+                return False
+
+            time.sleep(delay)
+            continue
+
+        if job.status == PurgeJob.DONE:
+            return True
+
+        logger.info("Purge job %s: %s of %s users", job.pk, job.processed, len(job.user_ids))
+        time.sleep(max(0.0, _seconds_until(job.next_batch_at)))
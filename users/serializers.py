@@ -1,13 +1,14 @@
 import logging
 from typing import Any
 
-from django.db.models import Q
 from django.contrib.auth import authenticate
 from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
 
-from users.models import CustomUser
+from users.authentication import ProfileRefreshToken
+from users import audit
+from users.models import AVATAR_MAX_SIZE, AuthAuditEvent, AvatarUpload, CustomUser
+from users.presence import get_presence_backend
 
 logger = logging.getLogger(__name__)
 
@@ -15,11 +16,21 @@ logger = logging.getLogger(__name__)
 class CustomUserSerializer(serializers.ModelSerializer):
     """
     Сериализатор для представления данных пользователя.
+
+    id отдается строкой: Snowflake-идентификаторы больше 2^53 и теряют
+    точность в JSON-числах у клиентов на JavaScript.
+    is_online берется из хранилища присутствия, а не из базы данных.
     """
 
+    id = serializers.CharField(source="pk", read_only=True)
+    is_online = serializers.SerializerMethodField()
+
     class Meta:
         model = CustomUser
-        fields = ("id", "username", "email", "avatar", "bio")
+        fields = ("id", "username", "email", "avatar", "avatar_thumbnail", "bio", "is_online")
+
+    def get_is_online(self, obj: CustomUser) -> bool:
+        return get_presence_backend().is_online(obj.pk)
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -40,8 +51,8 @@ class RegisterSerializer(serializers.ModelSerializer):
             logger.error("Passwords do not match")
             raise serializers.ValidationError(_("Passwords do not match"))
 
-        if CustomUser.objects.filter(
-            Q(username=attrs["username"]) | Q(email=attrs["email"])
+        if CustomUser.objects.filter_case_insensitive(
+            username=attrs["username"], email=attrs["email"]
         ).exists():
             logger.error("User with this username or email already exists")
             raise serializers.ValidationError(
@@ -79,10 +90,16 @@ class TokenObtainPairSerializer(serializers.Serializer):
 
         if user is None or not user.is_active:
             logger.error("Invalid username or password")
+            audit.record(
+                AuthAuditEvent.LOGIN_FAILED,
+                username=attrs["username"],
+                ip=audit.client_ip(self.context.get("request")),
+                reason="inactive_user" if user is not None else "invalid_credentials",
+            )
             raise serializers.ValidationError(_("Invalid username or password"))
 
 
-        refresh = RefreshToken.for_user(user)
+        refresh = ProfileRefreshToken.for_user(user)
 
         return {
             "access": str(refresh.access_token),  # type: ignore[attr-defined]
@@ -94,3 +111,51 @@ class TokenObtainPairSerializer(serializers.Serializer):
 
     def update(self, instance: Any, validated_data: dict[str, Any]) -> None:
         pass
+
+
+class AvatarUploadSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор для создания и отслеживания загрузки аватара частями.
+    """
+
+    class Meta:
+        model = AvatarUpload
+        fields = ("id", "filename", "size", "checksum", "offset", "status", "error")
+        read_only_fields = ("id", "offset", "status", "error")
+
+    def validate_size(self, value: int) -> int:
+        if not 0 < value <= AVATAR_MAX_SIZE:
+            logger.error("Avatar file size must not exceed 5MB")
+            raise serializers.ValidationError(_("Avatar file size must not exceed 5MB"))
+        return value
+
+    def validate_checksum(self, value: str) -> str:
+        value = value.lower()
+        if len(value) != 64 or any(char not in "0123456789abcdef" for char in value):
+            logger.error("Checksum must be a SHA-256 hex digest")
+            raise serializers.ValidationError(_("Checksum must be a SHA-256 hex digest"))
+        return value
+
+
+class PresenceQuerySerializer(serializers.Serializer):
+    """
+    Сериализатор для списка id пользователей в запросе присутствия (?ids=1,2,3).
+    id приходят строками и отдаются строками (см. CustomUserSerializer).
+    """
+
+    MAX_IDS = 1000
+
+    ids = serializers.CharField()
+
+    def validate_ids(self, value: str) -> list[int]:
+        try:
+            ids = [int(user_id) for user_id in value.split(",") if user_id]
+        except ValueError as e:
+            logger.error("Invalid user ids")
+            raise serializers.ValidationError(_("Invalid user ids")) from e
+
+        if len(ids) > self.MAX_IDS:
+            logger.error("Too many user ids")
+            raise serializers.ValidationError(_("Too many user ids"))
+
+        return ids
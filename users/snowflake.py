@@ -0,0 +1,321 @@
+import atexit
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections, models
+from django.utils.translation import gettext_lazy as _
+
+logger = logging.getLogger(__name__)
+
+
+# 1 бит знака | 41 бит миллисекунд от EPOCH_MS | 10 бит worker id | 12 бит последовательности
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+class SnowflakeGenerator:
+    """
+    Генератор упорядоченных по времени 64-битных идентификаторов.
+
+    Идентификаторы уникальны, пока у каждого процесса свой worker id
+    (см. WorkerLease), и выдаются без обращения к базе данных. Состояние общее только для
+    потоков одного процесса. Если часы отстают или последовательность
+    переполнена в пределах миллисекунды, генератор занимает следующую
+    миллисекунду, а не ждет.
+    """
+
+    def __init__(self, worker_id: int) -> None:
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(_(f"Worker id must be between 0 and {MAX_WORKER_ID}"))
+
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def _reserve(self, count: int) -> tuple[int, int, int]:
+        # Возвращает (миллисекунда, первый номер, сколько номеров выдано в этой миллисекунде)
+        now = int(time.time() * 1000) - EPOCH_MS
+
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            elif self._sequence > MAX_SEQUENCE:
+                self._last_ms += 1
+                self._sequence = 0
+
+            start = self._sequence
+            taken = min(count, MAX_SEQUENCE + 1 - start)
+            self._sequence += taken
+            return self._last_ms, start, taken
+
+    def _compose(self, ms: int, sequence: int) -> int:
+        return (ms << (WORKER_ID_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | sequence
+
+    def next_id(self) -> int:
+        ms, sequence, _taken = self._reserve(1)
+        return self._compose(ms, sequence)
+
+    def generate(self, count: int) -> list[int]:
+        """
+        Выдает count идентификаторов сразу, например для bulk_create.
+        """
+        ids: list[int] = []
+
+        while len(ids) < count:
+            ms, start, taken = self._reserve(count - len(ids))
+            ids.extend(self._compose(ms, sequence) for sequence in range(start, start + taken))
+
+        return ids
+
+
+class WorkerLease:
+    """
+    Аренда worker id в таблице SnowflakeWorkerLease.
+
+    Процесс занимает свободный или просроченный номер на ttl секунд и продлевает
+    аренду в фоновом потоке каждые ttl / 3 секунд. Запросы идут через отдельное
+    соединение в режиме autocommit, чтобы не зависеть от транзакции вызывающего кода.
+    Срок аренды отсчитывается и по локальным часам: если продлить ее не удалось,
+    valid становится ложным раньше, чем номер может занять другой процесс.
+    """
+
+    ACQUIRE_ATTEMPTS = 5
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"[-128:]
+        self.worker_id: Optional[int] = None
+        self._valid_until = 0.0
+        self._stopped = threading.Event()
+
+    @property
+    def valid(self) -> bool:
+        return self.worker_id is not None and time.monotonic() < self._valid_until
+
+    def _execute(self, sql: str, params: list[Any]) -> list[tuple[Any, ...]]:
+        from users.models import SnowflakeWorkerLease
+
+        connection = connections.create_connection(DEFAULT_DB_ALIAS)
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(sql.format(table=SnowflakeWorkerLease._meta.db_table), params)
+                return cursor.fetchall() if cursor.description else []
+        finally:
+            connection.close()
+
+    def acquire(self) -> int:
+        """
+        Занимает свободный номер. Если свободных номеров нет, бросает ImproperlyConfigured.
+        """
+        for _attempt in range(self.ACQUIRE_ATTEMPTS):
+            started = time.monotonic()
+            # Конкурирующие процессы выбирают номер случайно; проигравший
+            # в ON CONFLICT не получает строку и пробует снова
+            rows = self._execute(
+                """
+                INSERT INTO "{table}" (worker_id, owner, expires_at)
+                SELECT candidate, %s, now() + make_interval(secs => %s)
+                FROM generate_series(0, %s) AS candidate
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM "{table}" lease
+                    WHERE lease.worker_id = candidate AND lease.expires_at > now()
+                )
+                ORDER BY random()
+                LIMIT 1
+                ON CONFLICT (worker_id) DO UPDATE
+                SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+                WHERE "{table}".expires_at <= now()
+                RETURNING worker_id
+                """,
+                [self.owner, self.ttl, MAX_WORKER_ID],
+            )
+
+            if rows:
+                worker_id: int = rows[0][0]
+                self.worker_id = worker_id
+                self._valid_until = started + self.ttl
+                logger.info("Leased Snowflake worker id %s", worker_id)
+                return worker_id
+
+        logger.error("No free Snowflake worker id")
+        raise ImproperlyConfigured(_("No free Snowflake worker id, set SNOWFLAKE_WORKER_ID explicitly"))
+
+    def renew(self) -> bool:
+        """
+        Продлевает аренду. Возвращает False, если номер уже занят другим процессом.
+        """
+        started = time.monotonic()
+        rows = self._execute(
+            """
+            UPDATE "{table}" SET expires_at = now() + make_interval(secs => %s)
+            WHERE worker_id = %s AND owner = %s
+            RETURNING worker_id
+            """,
+            [self.ttl, self.worker_id, self.owner],
+        )
+
+        if not rows:
+            logger.error("Snowflake worker id %s lease lost", self.worker_id)
+            self._valid_until = 0.0
+            return False
+
+        self._valid_until = started + self.ttl
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def release(self) -> None:
+        self.stop()
+
+        if self.worker_id is not None:
+            self._execute(
+                'DELETE FROM "{table}" WHERE worker_id = %s AND owner = %s',
+                [self.worker_id, self.owner],
+            )
+            self._valid_until = 0.0
+
+    def start(self) -> None:
+        threading.Thread(target=self._run, name="snowflake-lease", daemon=True).start()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.ttl / 3):
+            try:
+                if not self.renew():
+                    return
+            except Exception as e:
+                # Срок по локальным часам истечет сам, если ошибка не временная
+                logger.error("Failed to renew Snowflake worker id %s lease: %s", self.worker_id, e)
+
+
+_generator: Optional[SnowflakeGenerator] = None
+_lease: Optional[WorkerLease] = None
+_lock = threading.Lock()
+
+
+def _create_generator() -> SnowflakeGenerator:
+    global _lease
+
+    configured = getattr(settings, "SNOWFLAKE_WORKER_ID", None)
+
+    if configured is not None:
+        return SnowflakeGenerator(int(configured))
+
+    if _lease is not None:
+        _lease.stop()
+
+    _lease = WorkerLease(settings.SNOWFLAKE_WORKER_LEASE_TTL)
+    worker_id = _lease.acquire()
+    _lease.start()
+
+    # Тот же номер после потери аренды: продолжаем последовательность прежнего генератора
+    if _generator is not None and _generator.worker_id == worker_id:
+        return _generator
+
+    return SnowflakeGenerator(worker_id)
+
+
+def get_generator() -> SnowflakeGenerator:
+    """
+    Возвращает генератор процесса. worker id берется из SNOWFLAKE_WORKER_ID,
+    а если он не задан — арендуется через WorkerLease и переарендуется после истечения.
+    """
+    global _generator
+
+    generator = _generator
+
+    if generator is not None and (_lease is None or _lease.valid):
+        return generator
+
+    with _lock:
+        if _generator is None or (_lease is not None and not _lease.valid):
+            _generator = _create_generator()
+
+        return _generator
+
+
+def _reset_after_fork() -> None:
+    # Дочерний процесс не должен продолжать последовательность родителя
+    # и пользоваться его арендой: поток продления после fork не работает
+    global _generator, _lease, _lock
+    _generator = None
+    _lease = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _release_on_exit() -> None:
+    if _lease is None:
+        return
+
+    try:
+        _lease.release()
+    except Exception as e:
+        logger.error("Failed to release Snowflake worker id %s lease: %s", _lease.worker_id, e)
+
+
+def next_id() -> int:
+    return get_generator().next_id()
+
+
+def generate_ids(count: int) -> list[int]:
+    return get_generator().generate(count)
+
+
+def snowflake_datetime(value: int) -> datetime:
+    """
+    Возвращает время создания идентификатора.
+    """
+    ms = (value >> (WORKER_ID_BITS + SEQUENCE_BITS)) + EPOCH_MS
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+class SnowflakeField(models.BigIntegerField):
+    """
+    Поле bigint для первичного ключа, значение которого выдает SnowflakeGenerator
+    при сохранении (в том числе в bulk_create) — до INSERT, без обращения к последовательности.
+    Пустые экземпляры модели id не получают, поэтому worker id арендуется
+    только при первой записи, а не при запуске процесса.
+
+    default задан, чтобы Model.save() для нового экземпляра сразу выполнял
+    INSERT, без предварительного UPDATE по только что выданному id;
+    get_default() при этом возвращает None.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("default", next_id)
+        kwargs.setdefault("editable", False)
+        super().__init__(*args, **kwargs)
+
+    def get_default(self) -> Any:
+        return None
+
+    def get_pk_value_on_save(self, instance: models.Model) -> Any:
+        return next_id()
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+
+        if kwargs.get("default") is next_id:
+            del kwargs["default"]
+        if kwargs.get("editable") is False:
+            del kwargs["editable"]
+
+        return name, path, args, kwargs
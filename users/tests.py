@@ -1,8 +1,55 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta, timezone as dt_timezone
+from unittest import mock
+
 import pytest
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.db import DatabaseError, IntegrityError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from .models import CustomUser
+from . import audit
+from .checks import check_shared_caches
+from .claims import CLAIMS_KEY
+from .idempotency import idempotent
+from .models import AuthAuditEvent, AvatarUpload, CustomUser, PurgeJob, SnowflakeWorkerLease, UserEvent
+from .outbox import EventSink, FileSink, OutboxDispatcher, QueueSink
+from .presence import CachePresenceBackend, LocalPresenceBackend, get_presence_backend
+from .purge import run_batch, run_job
+from .throttling import FailedLoginThrottle
+from .snowflake import (
+    MAX_SEQUENCE,
+    MAX_WORKER_ID,
+    SEQUENCE_BITS,
+    SnowflakeGenerator,
+    WorkerLease,
+    generate_ids,
+    snowflake_datetime
+)
+from .uploads import expire_uploads, process_pending_uploads
 from .serializers import (
     CustomUserSerializer,
     RegisterSerializer,
@@ -117,6 +164,7 @@ class TestCustomUserSerializer:
 
         serializer = CustomUserSerializer(user)
 
+        assert serializer.data["id"] == str(user.pk)
         assert serializer.data["username"] == "test_user"
         assert serializer.data["email"] == "sample_email@gmail.com"
 
@@ -245,4 +293,844 @@ class TestTokenObtainPairSerializer:
 
         assert not serializer.is_valid()
         assert "Invalid username or password" in serializer.errors["non_field_errors"]
-        
\ No newline at end of file
+
+
+@pytest.mark.django_db
+class TestCaseInsensitiveIdentity:
+    def test_register_serializer_email_case_insensitive(self):
+        CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+
+        data = {
+            "username": "test_user1",
+            "email": "Sample_Email@gmail.com",
+            "password": "test_password",
+            "password2": "test_password"
+        }
+
+        serializer = RegisterSerializer(data=data)
+
+        assert not serializer.is_valid()
+        assert "User with this username or email already exists" in serializer.errors["non_field_errors"]
+
+    def test_username_unique_case_insensitive(self):
+        CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+
+        with pytest.raises(IntegrityError):
+            CustomUser.objects.create(username='Test_User', email='sample@gmail.com')
+
+    @pytest.mark.parametrize("identifier", ["test_user", "TEST_USER", "Sample_Email@gmail.com"])
+    def test_authenticate_by_username_or_email(self, identifier):
+        user = CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+
+        assert authenticate(username=identifier, password='test_password') == user
+
+    def test_authenticate_prefers_username_match(self):
+        CustomUser.objects.create_user(
+            username='first_user',
+            email='owner@gmail.com',
+            password='first_password'
+        )
+        user = CustomUser.objects.create_user(
+            username='owner@gmail.com',
+            email='second@gmail.com',
+            password='second_password'
+        )
+
+        assert authenticate(username='owner@gmail.com', password='second_password') == user
+        assert authenticate(username='owner@gmail.com', password='first_password') is None
+
+
+class CountingView(APIView):
+    permission_classes = [AllowAny]
+    calls = 0
+    delay = 0.0
+
+    @idempotent
+    def post(self, request):
+        CountingView.calls += 1
+        time.sleep(CountingView.delay)
+        return Response({"calls": CountingView.calls}, status=status.HTTP_201_CREATED)
+
+
+class TokenView(APIView):
+    permission_classes = [AllowAny]
+
+    @idempotent(exclude=("access",))
+    def post(self, request):
+        return Response({"user": "test_user", "access": "secret"}, status=status.HTTP_201_CREATED)
+
+
+class TestIdempotency:
+    def setup_method(self):
+        cache.clear()
+        CountingView.calls = 0
+        CountingView.delay = 0.0
+
+    def post(self, data, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        request = APIRequestFactory().post("/", data, format="json", **headers)
+        return CountingView.as_view()(request)
+
+    def test_replay_returns_original_response(self):
+        first = self.post({"username": "test_user"}, key="key-1")
+        second = self.post({"username": "test_user"}, key="key-1")
+
+        assert first.status_code == second.status_code == 201
+        assert second.data == {"calls": 1}
+        assert second["Idempotent-Replayed"] == "true"
+        assert CountingView.calls == 1
+
+    def test_without_key_is_not_cached(self):
+        self.post({"username": "test_user"})
+        self.post({"username": "test_user"})
+
+        assert CountingView.calls == 2
+
+    def test_key_reused_with_different_payload(self):
+        self.post({"username": "test_user"}, key="key-1")
+        response = self.post({"username": "other_user"}, key="key-1")
+
+        assert response.status_code == 422
+        assert CountingView.calls == 1
+
+    def test_concurrent_requests_are_coalesced(self):
+        CountingView.delay = 0.3
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(self.post, {"username": "test_user"}, "key-1")
+            time.sleep(0.1)
+            second = executor.submit(self.post, {"username": "test_user"}, "key-1")
+
+        assert first.result().status_code == second.result().status_code == 201
+        assert second.result().data == {"calls": 1}
+        assert CountingView.calls == 1
+
+    def test_excluded_fields_are_not_stored(self):
+        def post():
+            request = APIRequestFactory().post("/", {}, format="json", HTTP_IDEMPOTENCY_KEY="key-1")
+            return TokenView.as_view()(request)
+
+        assert post().data == {"user": "test_user", "access": "secret"}
+
+        replayed = post()
+        assert replayed.status_code == 201
+        assert replayed.data == {"user": "test_user"}
+        assert "secret" not in repr(list(cache._cache.values()))
+
+    def test_request_finished_between_read_and_lock_is_replayed(self):
+        self.post({"username": "test_user"}, key="key-1")
+        real_cache = cache
+        reads = []
+
+        class StaleFirstRead:
+            # Первое чтение не видит ответ, сохраненный «параллельным» запросом
+            def get(self, key):
+                reads.append(key)
+                return None if len(reads) == 1 else real_cache.get(key)
+
+            def __getattr__(self, name):
+                return getattr(real_cache, name)
+
+        with mock.patch("users.idempotency._cache", return_value=StaleFirstRead()):
+            response = self.post({"username": "test_user"}, key="key-1")
+
+        assert response.status_code == 201
+        assert response.data == {"calls": 1}
+        assert CountingView.calls == 1
+
+    def test_in_progress_request_times_out(self, settings):
+        settings.IDEMPOTENCY_LOCK_WAIT = 0.1
+        CountingView.delay = 0.5
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            executor.submit(self.post, {"username": "test_user"}, "key-1")
+            time.sleep(0.1)
+            second = executor.submit(self.post, {"username": "test_user"}, "key-1")
+
+        assert second.result().status_code == 409
+        assert CountingView.calls == 1
+
+
+class FailingSink(EventSink):
+    def send(self, messages):
+        raise ConnectionError("sink is down")
+
+
+@pytest.mark.django_db
+class TestUserEventOutbox:
+    def create_user(self):
+        return CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+
+    def test_register_writes_event(self):
+        user = self.create_user()
+
+        event = UserEvent.objects.get()
+        assert event.event_type == UserEvent.REGISTERED
+        assert event.user_id == user.pk
+        assert event.dispatched_at is None
+
+    def test_profile_update_and_deactivation(self):
+        self.create_user()
+        user = CustomUser.objects.get(username='test_user')
+
+        user.bio = "Hello"
+        user.save()
+        user.is_active = False
+        user.save()
+
+        events = list(UserEvent.objects.order_by("id").values_list("event_type", "payload__changed"))
+        assert events == [
+            (UserEvent.REGISTERED, []),
+            (UserEvent.UPDATED, ["bio"]),
+            (UserEvent.DEACTIVATED, ["is_active"]),
+        ]
+
+    def test_last_login_update_writes_no_event(self):
+        user = self.create_user()
+
+        user.last_login = timezone.now()
+        user.save(update_fields=["last_login"])
+
+        assert UserEvent.objects.count() == 1
+
+    def test_dispatcher_delivers_batch(self):
+        user = self.create_user()
+        sink = QueueSink()
+        dispatcher = OutboxDispatcher(sinks=[sink], batch_size=10)
+
+        assert dispatcher.dispatch_batch() == 1
+        assert dispatcher.dispatch_batch() == 0
+
+        message = sink.queue.get_nowait()
+        assert message["type"] == UserEvent.REGISTERED
+        assert message["user_id"] == str(user.pk)
+        assert UserEvent.objects.get().dispatched_at is not None
+        assert dispatcher.metrics()["pending"] == 0
+
+    def test_dispatcher_failure_schedules_retry(self):
+        self.create_user()
+        dispatcher = OutboxDispatcher(sinks=[FailingSink()], retry_base=60)
+
+        assert dispatcher.dispatch_batch() == 1
+
+        event = UserEvent.objects.get()
+        assert event.dispatched_at is None
+        assert event.attempts == 1
+        assert event.next_attempt_at > timezone.now()
+        assert "sink is down" in event.last_error
+        assert dispatcher.dispatch_batch() == 0
+
+    def test_dispatcher_claims_batch_before_delivery(self):
+        self.create_user()
+        seen = []
+
+        class ClaimCheckingSink(EventSink):
+            def send(self, messages):
+                event = UserEvent.objects.get()
+                seen.append(event.next_attempt_at > timezone.now())
+                seen.append(OutboxDispatcher(sinks=[QueueSink()]).dispatch_batch())
+
+        assert OutboxDispatcher(sinks=[ClaimCheckingSink()], claim_timeout=60).dispatch_batch() == 1
+        assert seen == [True, 0]
+        assert UserEvent.objects.get().dispatched_at is not None
+
+    def test_delete_dispatched_respects_retention(self):
+        user = self.create_user()
+        user.bio = "Hello"
+        user.save()
+        old, recent = UserEvent.objects.order_by("id")
+        UserEvent.objects.filter(pk=old.pk).update(dispatched_at=timezone.now() - timedelta(days=8))
+        UserEvent.objects.filter(pk=recent.pk).update(dispatched_at=timezone.now() - timedelta(days=1))
+        user.bio = "Bye"
+        user.save()
+
+        dispatcher = OutboxDispatcher(sinks=[], retention=timedelta(days=7))
+
+        assert dispatcher.delete_dispatched(chunk_size=1) == 1
+        assert not UserEvent.objects.filter(pk=old.pk).exists()
+        assert UserEvent.objects.count() == 2
+
+    def test_file_sink_creates_directory(self, tmp_path):
+        self.create_user()
+        path = tmp_path / "events" / "user_events.jsonl"
+
+        assert OutboxDispatcher(sinks=[FileSink(str(path))]).dispatch_batch() == 1
+        assert json.loads(path.read_text())["type"] == UserEvent.REGISTERED
+
+
+@pytest.mark.django_db
+class TestAvatarUpload:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path / "media")
+        settings.AVATAR_UPLOAD_TMP_DIR = str(tmp_path / "uploads")
+        settings.AVATAR_UPLOAD_MAX_CHUNK_SIZE = 1024
+
+        self.user = CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        buffer = io.BytesIO()
+        Image.frombytes("RGB", (300, 200), os.urandom(300 * 200 * 3)).save(buffer, format="PNG")
+        self.image = buffer.getvalue()
+
+    def start(self, checksum=None):
+        response = self.client.post(reverse("users:avatar-upload"), {
+            "filename": "avatar.png",
+            "size": len(self.image),
+            "checksum": checksum or hashlib.sha256(self.image).hexdigest(),
+        }, format="json")
+        assert response.status_code == 201
+        return response.data["id"]
+
+    def send(self, upload_id, offset, chunk):
+        return self.client.generic(
+            "PATCH",
+            reverse("users:avatar-upload-detail", args=[upload_id]),
+            chunk,
+            content_type="application/offset+octet-stream",
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def upload_all(self, upload_id):
+        response = None
+        for offset in range(0, len(self.image), 1024):
+            response = self.send(upload_id, offset, self.image[offset:offset + 1024])
+        return response
+
+    def test_chunked_upload_and_processing(self):
+        upload_id = self.start()
+
+        response = self.upload_all(upload_id)
+        assert response.status_code == 200
+        assert response.data["status"] == AvatarUpload.ASSEMBLED
+
+        assert process_pending_uploads() == 1
+
+        response = self.client.get(reverse("users:avatar-upload-detail", args=[upload_id]))
+        assert response.data["status"] == AvatarUpload.READY
+
+        self.user.refresh_from_db()
+        assert self.user.avatar.read() == self.image
+        with Image.open(self.user.avatar_thumbnail) as thumbnail:
+            assert max(thumbnail.size) == 128
+
+    def test_resume_after_offset_mismatch(self):
+        upload_id = self.start()
+        self.send(upload_id, 0, self.image[:1024])
+
+        response = self.send(upload_id, 0, self.image[:1024])
+        assert response.status_code == 409
+        assert response.data["offset"] == 1024
+
+        response = self.send(upload_id, 1024, self.image[1024:2048])
+        assert response.status_code == 200
+        assert response.data["offset"] == 2048
+
+    def test_checksum_mismatch(self):
+        upload_id = self.start(checksum="0" * 64)
+
+        response = self.upload_all(upload_id)
+
+        assert response.status_code == 422
+        assert response.data["status"] == AvatarUpload.FAILED
+        assert process_pending_uploads() == 0
+
+    def test_chunk_too_large(self):
+        upload_id = self.start()
+
+        response = self.send(upload_id, 0, self.image[:2048])
+
+        assert response.status_code == 413
+
+    def test_stale_uploads_expire(self, settings):
+        stale_id, active_id = self.start(), self.start()
+        self.send(stale_id, 0, self.image[:1024])
+        self.send(active_id, 0, self.image[:1024])
+        AvatarUpload.objects.filter(pk=stale_id).update(updated_at=timezone.now() - timedelta(days=2))
+
+        orphan = os.path.join(settings.AVATAR_UPLOAD_TMP_DIR, "00000000-0000-0000-0000-000000000000.part")
+        with open(orphan, "wb") as file:
+            file.write(b"orphan")
+        parts = [AvatarUpload.objects.get(pk=pk).part_path for pk in (stale_id, active_id)] + [orphan]
+        for path in parts:
+            os.utime(path, (time.time() - 3600, time.time() - 3600))
+
+        assert expire_uploads(max_age=24 * 60 * 60) == 2
+
+        assert AvatarUpload.objects.get(pk=stale_id).status == AvatarUpload.FAILED
+        assert [os.path.exists(path) for path in parts] == [False, True, False]
+
+
+def generate_in_process(count):
+    return generate_ids(count) + [generate_ids(1)[0] for _ in range(count)]
+
+
+class TestSnowflake:
+    def test_ids_are_unique_and_ordered(self):
+        generator = SnowflakeGenerator(worker_id=1)
+
+        ids = [generator.next_id() for _ in range(10000)] + generator.generate(10000)
+
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert abs((snowflake_datetime(ids[0]) - timezone.now()).total_seconds()) < 5
+
+    def test_sequence_overflow_and_clock_skew(self):
+        generator = SnowflakeGenerator(worker_id=1)
+
+        with mock.patch("users.snowflake.time.time", return_value=1800000000.0):
+            ids = generator.generate(MAX_SEQUENCE * 3)
+        with mock.patch("users.snowflake.time.time", return_value=1700000000.0):
+            ids.append(generator.next_id())
+
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+
+    def test_invalid_worker_id(self):
+        with pytest.raises(ValueError):
+            SnowflakeGenerator(worker_id=1024)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_unique_across_processes(self, settings):
+        settings.SNOWFLAKE_WORKER_ID = None
+
+        with multiprocessing.get_context("fork").Pool(4) as pool:
+            results = pool.map(generate_in_process, [5000] * 8)
+
+        ids = [value for chunk in results for value in chunk]
+        assert len(set(ids)) == len(ids)
+        assert len({value >> SEQUENCE_BITS & MAX_WORKER_ID for value in ids}) > 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_worker_lease(self):
+        first, second = WorkerLease(ttl=60), WorkerLease(ttl=60)
+
+        assert first.acquire() != second.acquire()
+        assert first.valid and first.renew()
+
+        SnowflakeWorkerLease.objects.filter(worker_id=first.worker_id).update(owner="other")
+
+        assert not first.renew()
+        assert not first.valid
+
+        second.release()
+        assert not SnowflakeWorkerLease.objects.filter(worker_id=second.worker_id).exists()
+
+    @pytest.mark.django_db(transaction=True)
+    def test_worker_lease_exhausted(self):
+        SnowflakeWorkerLease.objects.bulk_create([
+            SnowflakeWorkerLease(worker_id=i, owner="other", expires_at=timezone.now() + timedelta(minutes=1))
+            for i in range(MAX_WORKER_ID + 1)
+        ])
+
+        with pytest.raises(ImproperlyConfigured):
+            WorkerLease(ttl=60).acquire()
+
+    @pytest.mark.django_db
+    def test_user_id_allocated_before_insert(self):
+        user = CustomUser(username='test_user', email='sample_email@gmail.com')
+        assert user.id is None
+
+        with CaptureQueriesContext(connection) as queries:
+            user.save()
+        assert user.id is not None
+        # Новая строка сразу вставляется, без UPDATE по выданному id
+        assert not [query for query in queries.captured_queries if query["sql"].startswith("UPDATE")]
+        assert len([query for query in queries.captured_queries if query["sql"].startswith("INSERT")]) == 2
+
+        users = CustomUser.objects.bulk_create([
+            CustomUser(username=f'user_{i}', email=f'user_{i}@gmail.com') for i in range(3)
+        ])
+
+        assert CustomUser.objects.filter(id__in=[u.id for u in users]).count() == 3
+
+
+class TestPresence:
+    @pytest.mark.parametrize("backend_class", [LocalPresenceBackend, CachePresenceBackend])
+    def test_online(self, backend_class):
+        cache.clear()
+        backend = backend_class(ttl=60)
+
+        backend.heartbeat(1)
+        backend.heartbeat(3)
+
+        assert backend.online([1, 2, 3]) == {1, 3}
+        assert backend.is_online(1)
+        assert not backend.is_online(2)
+
+    def test_local_backend_expires_old_buckets(self):
+        backend = LocalPresenceBackend(ttl=60, bucket_seconds=30)
+
+        with mock.patch("users.presence.time.time", return_value=1000.0):
+            backend.heartbeat(1)
+        with mock.patch("users.presence.time.time", return_value=1050.0):
+            backend.heartbeat(2)
+            assert backend.online([1, 2]) == {1, 2}
+        with mock.patch("users.presence.time.time", return_value=1100.0):
+            assert backend.online([1, 2]) == {2}
+        with mock.patch("users.presence.time.time", return_value=1200.0):
+            assert backend.online([1, 2]) == set()
+
+    def test_process_local_cache_is_rejected(self, settings):
+        assert {error.id for error in check_shared_caches(None)} == {"users.E001"}
+
+        settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "django_cache"}}
+        assert check_shared_caches(None) == []
+
+    @pytest.mark.django_db
+    def test_heartbeat_and_query_endpoints(self):
+        get_presence_backend.cache_clear()
+        cache.clear()
+        user = CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        assert client.get(reverse("users:profile")).data["is_online"] is False
+        assert client.post(reverse("users:presence-heartbeat")).status_code == 204
+
+        response = client.get(reverse("users:presence"), {"ids": f"{user.pk},42"})
+        assert response.data == {"online": [str(user.pk)]}
+        assert client.get(reverse("users:profile")).data["is_online"] is True
+        assert client.get(reverse("users:presence"), {"ids": "a,b"}).status_code == 400
+
+
+@pytest.mark.django_db
+class TestProfileClaims:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.JWT_PROFILE_CLAIMS = True
+        cache.clear()
+
+        self.user = CustomUser.objects.create_user(
+            username='test_user',
+            email='sample_email@gmail.com',
+            password='test_password'
+        )
+
+    def client_with_token(self):
+        serializer = TokenObtainPairSerializer(data={"username": "test_user", "password": "test_password"})
+        assert serializer.is_valid()
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {serializer.validated_data['access']}")
+        return client
+
+    def test_permission_only_endpoint_without_queries(self, django_assert_num_queries):
+        client = self.client_with_token()
+        client.post(reverse("users:presence-heartbeat"))
+
+        with django_assert_num_queries(0):
+            response = client.get(reverse("users:presence"), {"ids": str(self.user.pk)})
+
+        assert response.data == {"online": [str(self.user.pk)]}
+
+    def test_profile_loads_full_user(self):
+        response = self.client_with_token().get(reverse("users:profile"))
+
+        assert response.status_code == 200
+        assert response.data["email"] == "sample_email@gmail.com"
+
+    def test_stale_claims_are_rejected(self, django_capture_on_commit_callbacks):
+        client = self.client_with_token()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.user.username = "renamed_user"
+            self.user.save()
+
+        assert self.user.profile_version == 1
+        assert client.post(reverse("users:presence-heartbeat")).status_code == 401
+
+    def test_bio_change_keeps_claims_valid(self, django_capture_on_commit_callbacks):
+        client = self.client_with_token()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.user.bio = "Hello"
+            self.user.save()
+
+        assert self.user.profile_version == 0
+        assert client.post(reverse("users:presence-heartbeat")).status_code == 204
+
+    def test_refreshed_access_token_has_no_stale_claims(self, django_capture_on_commit_callbacks):
+        serializer = TokenObtainPairSerializer(data={"username": "test_user", "password": "test_password"})
+        assert serializer.is_valid()
+        refresh = RefreshToken(serializer.validated_data["refresh"])
+
+        assert CLAIMS_KEY in AccessToken(serializer.validated_data["access"])
+        assert CLAIMS_KEY not in refresh
+
+        with django_capture_on_commit_callbacks(execute=True):
+            self.user.username = "renamed_user"
+            self.user.save()
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {refresh.access_token}")
+
+        assert client.post(reverse("users:presence-heartbeat")).status_code == 204
+        assert client.get(reverse("users:profile")).data["username"] == "renamed_user"
+
+    def test_disabled_mode_uses_database_user(self, settings):
+        settings.JWT_PROFILE_CLAIMS = False
+        client = self.client_with_token()
+
+        assert client.get(reverse("users:profile")).data["username"] == "test_user"
+
+
+@pytest.mark.django_db
+class TestPurgeJob:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+
+        self.users = [
+            CustomUser.objects.create_user(
+                username=f'test_user_{i}',
+                email=f'sample_email_{i}@gmail.com',
+                password='test_password'
+            )
+            for i in range(5)
+        ]
+        self.ids = [user.pk for user in self.users]
+
+    def create_job(self, action):
+        return PurgeJob.objects.create(action=action, user_ids=self.ids, batch_size=2, max_rows_per_second=10 ** 6)
+
+    def test_deactivate(self):
+        job = self.create_job(PurgeJob.DEACTIVATE)
+
+        run_job(job.pk)
+
+        job.refresh_from_db()
+        assert job.status == PurgeJob.DONE
+        assert job.processed == 5
+        assert not CustomUser.objects.filter(pk__in=self.ids, is_active=True).exists()
+        assert UserEvent.objects.filter(event_type=UserEvent.DEACTIVATED).count() == 5
+
+    def test_delete_removes_related_rows_and_avatars(self):
+        user = self.users[0]
+        user.groups.add(Group.objects.create(name="spam"))
+        user.avatar.save("avatar.png", ContentFile(b"avatar"))
+        avatar = user.avatar.name
+
+        run_job(self.create_job(PurgeJob.DELETE).pk)
+
+        assert not CustomUser.objects.filter(pk__in=self.ids).exists()
+        assert not CustomUser.groups.through.objects.exists()
+        assert not default_storage.exists(avatar)
+        assert UserEvent.objects.filter(event_type=UserEvent.DELETED).count() == 5
+
+    def test_resume_from_checkpoint(self):
+        job = self.create_job(PurgeJob.DELETE)
+
+        run_batch(job.pk)
+        job.refresh_from_db()
+        assert job.status == PurgeJob.RUNNING
+        assert job.cursor == sorted(self.ids)[1]
+        assert CustomUser.objects.filter(pk__in=self.ids).count() == 3
+
+        run_job(job.pk)
+
+        job.refresh_from_db()
+        assert job.status == PurgeJob.DONE
+        assert job.processed == 5
+
+    def test_pacing_is_shared_between_workers(self):
+        job = PurgeJob.objects.create(action=PurgeJob.DEACTIVATE, user_ids=self.ids, batch_size=2, max_rows_per_second=1)
+
+        assert run_batch(job.pk) is not None
+        # Следующая пачка для любого обработчика — не раньше чем через 2 секунды
+        assert run_batch(job.pk) is None
+
+        job.refresh_from_db()
+        assert job.processed == 2
+        assert job.next_batch_at > timezone.now()
+
+    def test_locked_job_is_skipped(self):
+        job = self.create_job(PurgeJob.DEACTIVATE)
+
+        with mock.patch("users.purge.run_batch", return_value=None):
+            assert run_job(job.pk) is False
+
+    def test_failed_job_does_not_stop_worker(self):
+        failing = self.create_job(PurgeJob.DELETE)
+        job = self.create_job(PurgeJob.DEACTIVATE)
+
+        with mock.patch("users.purge._delete", side_effect=RuntimeError("storage is down")):
+            call_command("run_purge_jobs", "--once", stdout=io.StringIO(), stderr=io.StringIO())
+
+        failing.refresh_from_db()
+        job.refresh_from_db()
+        assert failing.status == PurgeJob.FAILED
+        assert failing.error == "storage is down"
+        assert job.status == PurgeJob.DONE
+
+
+@pytest.mark.django_db
+class TestAuthAudit:
+    def test_failed_login_is_buffered_and_copied(self):
+        request = APIRequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        serializer = TokenObtainPairSerializer(
+            data={"username": "Test_User", "password": "wrong\tpassword"},
+            context={"request": request},
+        )
+
+        assert not serializer.is_valid()
+        assert not AuthAuditEvent.objects.exists()
+
+        assert audit.audit_buffer.flush() == 1
+
+        event = AuthAuditEvent.objects.get()
+        assert event.event_type == AuthAuditEvent.LOGIN_FAILED
+        assert event.username == "test_user"
+        assert event.ip == "10.0.0.1"
+        assert event.reason == "invalid_credentials"
+
+    def test_failed_attempts_by_ip_and_username(self):
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "first_user", "10.0.0.1")
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "second_user", "10.0.0.1")
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "first_user", "10.0.0.2")
+        audit.record(AuthAuditEvent.REGISTER_REJECTED, "first_user", "10.0.0.3")
+        audit.audit_buffer.flush()
+
+        assert audit.failed_attempts(ip="10.0.0.1") == 2
+        assert audit.failed_attempts(username="First_User") == 2
+        assert audit.failed_attempts(ip="10.0.0.1", username="second_user") == 1
+        assert audit.failed_attempts(ip="10.0.0.2", username="second_user") == 0
+
+    def test_failed_login_throttle(self, settings):
+        settings.AUTH_AUDIT = {**settings.AUTH_AUDIT, "MAX_FAILED_ATTEMPTS": 2}
+        request = APIRequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        request.data = {"username": "test_user"}
+        throttle = FailedLoginThrottle()
+
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "test_user", "10.0.0.9")
+        audit.audit_buffer.flush()
+        assert throttle.allow_request(request, None)
+
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "other_user", "10.0.0.1")
+        audit.audit_buffer.flush()
+        assert throttle.allow_request(request, None)
+
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "third_user", "10.0.0.1")
+        audit.audit_buffer.flush()
+        assert not throttle.allow_request(request, None)
+
+    def test_failed_login_throttle_does_not_lock_out_user_from_other_ip(self, settings):
+        settings.AUTH_AUDIT = {
+            **settings.AUTH_AUDIT,
+            "MAX_FAILED_ATTEMPTS": 2,
+            "MAX_FAILED_ATTEMPTS_PER_USERNAME": 5,
+        }
+        request = APIRequestFactory().post("/", REMOTE_ADDR="10.0.0.1")
+        request.data = {"username": "test_user"}
+
+        for _ in range(4):
+            audit.record(AuthAuditEvent.LOGIN_FAILED, "test_user", "10.0.0.9")
+        audit.audit_buffer.flush()
+        assert FailedLoginThrottle().allow_request(request, None)
+
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "test_user", "10.0.0.8")
+        audit.audit_buffer.flush()
+        assert not FailedLoginThrottle().allow_request(request, None)
+
+    def test_client_ip_ignores_forwarded_for_without_proxy(self):
+        request = APIRequestFactory().post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.1")
+
+        assert audit.client_ip(request) == "10.0.0.1"
+
+    def test_client_ip_behind_proxy(self, settings):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+        factory = APIRequestFactory()
+
+        first = factory.post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="203.0.113.1")
+        second = factory.post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.1.1.1, 203.0.113.2")
+        spoofed = factory.post("/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="not-an-ip")
+
+        assert audit.client_ip(first) == "203.0.113.1"
+        assert audit.client_ip(second) == "203.0.113.2"
+        assert audit.client_ip(spoofed) is None
+
+        settings.AUTH_AUDIT = {**settings.AUTH_AUDIT, "MAX_FAILED_ATTEMPTS": 1}
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "first_user", audit.client_ip(first))
+        audit.audit_buffer.flush()
+        first.data, second.data = {"username": "first_user"}, {"username": "second_user"}
+
+        assert not FailedLoginThrottle().allow_request(first, None)
+        assert FailedLoginThrottle().allow_request(second, None)
+
+    def test_partitions(self):
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+
+        audit.ensure_partitions(days_ahead=3)
+        with connection.cursor() as cursor:
+            for days in (40, 31, 29):
+                name = audit._partition_name(today - timedelta(days=days))
+                start = audit._day_start(today - timedelta(days=days))
+                cursor.execute(
+                    f'CREATE TABLE "{name}" PARTITION OF "{audit.TABLE}" FOR VALUES FROM (%s) TO (%s)',
+                    [start, start + timedelta(days=1)],
+                )
+
+        dropped = audit.drop_partitions(retention_days=30)
+
+        assert dropped == [
+            audit._partition_name(today - timedelta(days=40)),
+            audit._partition_name(today - timedelta(days=31)),
+        ]
+        assert audit.ensure_partitions(days_ahead=3) == []
+
+    def test_partitions_recover_rows_from_default(self):
+        today = timezone.now().astimezone(dt_timezone.utc).date()
+        yesterday = today - timedelta(days=1)
+
+        with connection.cursor() as cursor:
+            for day in (today, yesterday):
+                cursor.execute(f'DROP TABLE IF EXISTS "{audit._partition_name(day)}"')
+
+        audit.record(AuthAuditEvent.LOGIN_FAILED, "test_user", "10.0.0.1")
+        audit.audit_buffer.flush()
+        AuthAuditEvent.objects.create(
+            created_at=audit._day_start(yesterday) + timedelta(hours=12),
+            event_type=AuthAuditEvent.LOGIN_FAILED,
+        )
+
+        create_partition = audit._create_partition
+
+        def fail_for_yesterday(cursor, day):
+            if day == yesterday:
+                raise DatabaseError("simulated")
+            create_partition(cursor, day)
+
+        with mock.patch("users.audit._create_partition", side_effect=fail_for_yesterday):
+            assert audit._partition_name(today) in audit.ensure_partitions()
+
+        assert audit.ensure_partitions() == [audit._partition_name(yesterday)]
+        assert AuthAuditEvent.objects.count() == 2
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{audit.DEFAULT_PARTITION}"')
+            assert cursor.fetchone()[0] == 0
@@ -0,0 +1,44 @@
+import logging
+from typing import Any, Optional
+
+from django.conf import settings
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+from users import audit
+
+logger = logging.getLogger(__name__)
+
+
+class FailedLoginThrottle(BaseThrottle):
+    """
+    Отклоняет вход, если за FAILED_ATTEMPTS_WINDOW минут (по журналу аудита
+    аутентификации) с IP-адреса было больше MAX_FAILED_ATTEMPTS неудачных попыток
+    или по имени пользователя со всех адресов больше MAX_FAILED_ATTEMPTS_PER_USERNAME.
+    Порог по имени намного выше порога по IP, чтобы чужие попытки не блокировали
+    вход владельцу учетной записи, но распределенный перебор пароля упирался в него.
+    """
+
+    def allow_request(self, request: Request, view: Any) -> bool:
+        config = settings.AUTH_AUDIT
+        username = request.data.get("username") if hasattr(request.data, "get") else None
+
+        # IP определяется через get_ident(), как и при записи в журнал
+        ip = audit.client_ip(request)
+        minutes = config["FAILED_ATTEMPTS_WINDOW"]
+
+        if ip is not None and audit.failed_attempts(ip=ip, minutes=minutes) >= config["MAX_FAILED_ATTEMPTS"]:
+            logger.warning("Too many failed login attempts from %s", ip)
+            return False
+
+        if username and (
+            audit.failed_attempts(username=str(username), minutes=minutes)
+            >= config["MAX_FAILED_ATTEMPTS_PER_USERNAME"]
+        ):
+            logger.warning("Too many failed login attempts for %s", username)
+            return False
+
+        return True
+
+    def wait(self) -> Optional[float]:
+        return settings.AUTH_AUDIT["FAILED_ATTEMPTS_WINDOW"] * 60
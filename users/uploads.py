@@ -0,0 +1,198 @@
+import hashlib
+import io
+import logging
+import os
+import time
+import uuid
+from datetime import timedelta
+from typing import BinaryIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from users.models import AvatarUpload, validate_avatar
+
+logger = logging.getLogger(__name__)
+
+
+READ_BLOCK_SIZE = 64 * 1024
+THUMBNAIL_SIZE = (128, 128)
+
+
+def write_chunk(upload: AvatarUpload, offset: int, stream: BinaryIO, length: int) -> int:
+    """
+    Записывает часть файла из потока запроса во временный файл по смещению offset.
+
+    Данные читаются блоками по READ_BLOCK_SIZE, поэтому расход памяти не
+    зависит от размера части. Повторная отправка той же части перезаписывает
+    те же байты. Возвращает количество фактически записанных байт.
+    """
+    os.makedirs(os.path.dirname(upload.part_path), exist_ok=True)
+    fd = os.open(upload.part_path, os.O_WRONLY | os.O_CREAT, 0o600)
+    written = 0
+
+    try:
+        while written < length:
+            data = stream.read(min(READ_BLOCK_SIZE, length - written))
+            if not data:
+                break
+            os.pwrite(fd, data, offset + written)
+            written += len(data)
+    finally:
+        os.close(fd)
+
+    return written
+
+
+def file_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(READ_BLOCK_SIZE), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def discard_part(upload: AvatarUpload) -> None:
+    try:
+        os.remove(upload.part_path)
+    except FileNotFoundError:
+        pass
+
+
+def complete_upload(upload: AvatarUpload) -> None:
+    """
+    Проверяет контрольную сумму собранного файла и ставит загрузку
+    в очередь на обработку, либо помечает ее как неудачную.
+    """
+    if file_checksum(upload.part_path) != upload.checksum.lower():
+        logger.error("Avatar upload %s checksum mismatch", upload.pk)
+        discard_part(upload)
+        upload.status = AvatarUpload.FAILED
+        upload.error = "Checksum mismatch"
+    else:
+        logger.info("Avatar upload %s assembled", upload.pk)
+        upload.status = AvatarUpload.ASSEMBLED
+
+    upload.save(update_fields=["status", "error", "updated_at"])
+
+
+def make_thumbnail(file: BinaryIO) -> ContentFile:
+    with Image.open(file) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        buffer = io.BytesIO()
+        image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB").save(buffer, format="PNG")
+
+    return ContentFile(buffer.getvalue())
+
+
+def process_upload(upload: AvatarUpload) -> None:
+    """
+    Проверяет собранный файл через validate_avatar, создает миниатюру
+    и сохраняет оба файла в поля пользователя.
+    """
+    user = upload.user
+
+    try:
+        with open(upload.part_path, "rb") as file:
+            avatar = File(file, name=upload.filename)
+            validate_avatar(avatar)
+
+            file.seek(0)
+            thumbnail = make_thumbnail(file)
+
+            file.seek(0)
+            name = os.path.basename(upload.filename)
+            user.avatar.save(name, avatar, save=False)
+            user.avatar_thumbnail.save(f"{os.path.splitext(name)[0]}.png", thumbnail, save=False)
+    except (ValidationError, OSError) as e:
+        logger.error("Avatar upload %s is invalid: %s", upload.pk, e)
+        upload.status = AvatarUpload.FAILED
+        upload.error = "; ".join(e.messages) if isinstance(e, ValidationError) else str(e)
+    else:
+        user.save(update_fields=["avatar", "avatar_thumbnail"])
+        upload.status = AvatarUpload.READY
+        logger.info("Avatar upload %s processed", upload.pk)
+
+    upload.save(update_fields=["status", "error", "updated_at"])
+    transaction.on_commit(lambda: discard_part(upload))
+
+
+def process_pending_uploads(batch_size: int = 10) -> int:
+    """
+    Обрабатывает пачку собранных загрузок. Загрузки захватываются через
+    SELECT ... FOR UPDATE SKIP LOCKED, поэтому обработчиков может быть несколько.
+    Возвращает количество обработанных загрузок.
+    """
+    with transaction.atomic():
+        uploads = list(
+            AvatarUpload.objects
+            .select_for_update(skip_locked=True, of=("self",))
+            .select_related("user")
+            .filter(status=AvatarUpload.ASSEMBLED)
+            .order_by("updated_at")[:batch_size]
+        )
+
+        for upload in uploads:
+            process_upload(upload)
+
+    return len(uploads)
+
+
+def expire_uploads(max_age: int) -> int:
+    """
+    Помечает как неудачные загрузки, не получавшие частей дольше max_age секунд,
+    и удаляет временные файлы без незавершенной загрузки — брошенные
+    и оставшиеся после удаления пользователя. Возвращает количество удаленных файлов.
+    """
+    expired = AvatarUpload.objects.filter(
+        status=AvatarUpload.UPLOADING,
+        updated_at__lt=timezone.now() - timedelta(seconds=max_age),
+    ).update(status=AvatarUpload.FAILED, error="Upload expired", updated_at=timezone.now())
+
+    if expired:
+        logger.info("%s avatar uploads expired", expired)
+
+    try:
+        names = os.listdir(settings.AVATAR_UPLOAD_TMP_DIR)
+    except FileNotFoundError:
+        return 0
+
+    parts = {}
+    for name in names:
+        try:
+            parts[uuid.UUID(name.removesuffix(".part"))] = os.path.join(settings.AVATAR_UPLOAD_TMP_DIR, name)
+        except ValueError:
+            continue
+
+    active = set(
+        AvatarUpload.objects
+        .filter(pk__in=parts, status__in=[AvatarUpload.UPLOADING, AvatarUpload.ASSEMBLED])
+        .values_list("pk", flat=True)
+    )
+    # Файл новой загрузки может появиться раньше, чем зафиксирована ее транзакция
+    cutoff = time.time() - 60
+    removed = 0
+
+    for upload_id, path in parts.items():
+        if upload_id in active:
+            continue
+
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+
+    if removed:
+        logger.info("Removed %s stale avatar upload files", removed)
+
+    return removed
+
@@ -1,6 +1,14 @@
 from django.urls import path
 
-from .views import CustomUserProfileView, RegisterView, TokenObtainPairView
+from .views import (
+    AvatarUploadDetailView,
+    AvatarUploadView,
+    CustomUserProfileView,
+    PresenceHeartbeatView,
+    PresenceView,
+    RegisterView,
+    TokenObtainPairView,
+)
 
 app_name = 'users'
 
@@ -8,6 +16,10 @@ urlpatterns = [
     path('v1/register/', RegisterView.as_view(), name='register'),
     path('v1/login/', TokenObtainPairView.as_view(), name='login'),
     path('v1/profile/', CustomUserProfileView.as_view(), name='profile'),
+    path('v1/avatar/uploads/', AvatarUploadView.as_view(), name='avatar-upload'),
+    path('v1/avatar/uploads/<uuid:pk>/', AvatarUploadDetailView.as_view(), name='avatar-upload-detail'),
+    path('v1/presence/', PresenceView.as_view(), name='presence'),
+    path('v1/presence/heartbeat/', PresenceHeartbeatView.as_view(), name='presence-heartbeat'),
 ]
 
 
@@ -1,6 +1,10 @@
 import logging
 from typing import Any
 
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
@@ -8,13 +12,21 @@ from rest_framework import status
 from rest_framework import generics
 from rest_framework.request import Request
 from rest_framework.throttling import UserRateThrottle
-from rest_framework_simplejwt.tokens import RefreshToken
 
+from . import audit
+from .authentication import ProfileRefreshToken
+from .idempotency import idempotent
+from .models import AuthAuditEvent, AvatarUpload, CustomUser
+from .presence import get_presence_backend
 from .serializers import (
+    AvatarUploadSerializer,
     CustomUserSerializer,
+    PresenceQuerySerializer,
     RegisterSerializer,
     TokenObtainPairSerializer
 )
+from .throttling import FailedLoginThrottle
+from .uploads import complete_upload, write_chunk
 
 
 logger = logging.getLogger(__name__)
@@ -22,10 +34,14 @@ logger = logging.getLogger(__name__)
 
 class RegisterView(APIView):
     """
-    View для регистрации пользователей
+    View для регистрации пользователей.
+
+    Повтор запроса с тем же Idempotency-Key возвращает сохраненный ответ 201
+    без токенов: они не хранятся в кеше и получаются через вход.
     """
     throttle_classes = [UserRateThrottle]  # settings
 
+    @idempotent(exclude=("refresh", "access"))
     def post(self, request: Request) -> Response:
         logger.info("Reguest for register user has been received..")
 
@@ -34,7 +50,7 @@ class RegisterView(APIView):
         if serializer.is_valid():
             user = serializer.save()
 
-            refresh = RefreshToken.for_user(user)
+            refresh = ProfileRefreshToken.for_user(user)
             data: dict[str, Any] = {
                 'user': serializer.data,
                 'refresh': str(refresh),
@@ -44,6 +60,12 @@ class RegisterView(APIView):
             return Response(data, status=status.HTTP_201_CREATED)
         
         logger.warning("Error registation: %s", serializer.errors)
+        audit.record(
+            AuthAuditEvent.REGISTER_REJECTED,
+            username=str(request.data.get("username", "")),
+            ip=audit.client_ip(request),
+            reason=",".join(serializer.errors),
+        )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -51,10 +73,12 @@ class TokenObtainPairView(APIView):
     """
     View для получения токена
     """
+    throttle_classes = [FailedLoginThrottle]
+
     def post(self, request: Request) -> Response:
         logger.info("Request for a token has been received")
 
-        serializer = TokenObtainPairSerializer(data=request.data)
+        serializer = TokenObtainPairSerializer(data=request.data, context={"request": request})
 
         if serializer.is_valid():
             logger.info("Token obtained successfully")
@@ -73,4 +97,119 @@ class CustomUserProfileView(generics.RetrieveAPIView):
 
     def get_object(self):
         logger.info("Request for user profile has been received")
-        return self.request.user
+
+        # В режиме JWT_PROFILE_CLAIMS request.user не содержит полей профиля
+        if isinstance(self.request.user, CustomUser):
+            return self.request.user
+        return get_object_or_404(CustomUser, pk=self.request.user.pk)
+
+
+class AvatarUploadView(APIView):
+    """
+    View для начала загрузки аватара частями
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        logger.info("Request for avatar upload has been received")
+
+        serializer = AvatarUploadSerializer(data=request.data)
+
+        if serializer.is_valid():
+            serializer.save(user_id=request.user.pk)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+        logger.warning("Error avatar upload: %s", serializer.errors)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class AvatarUploadDetailView(APIView):
+    """
+    View для отправки частей аватара и проверки состояния загрузки.
+
+    Часть передается телом PATCH-запроса, ее смещение в файле указывается
+    в заголовке Upload-Offset. Текущее смещение возвращает GET.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request, pk: str) -> Response:
+        upload = get_object_or_404(AvatarUpload, pk=pk, user_id=request.user.pk)
+        return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def patch(self, request: Request, pk: str) -> Response:
+        upload = get_object_or_404(AvatarUpload, pk=pk, user_id=request.user.pk)
+
+        if upload.status != AvatarUpload.UPLOADING:
+            logger.warning("Avatar upload %s is already %s", upload.pk, upload.status)
+            return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_409_CONFLICT)
+
+        try:
+            offset = int(request.headers["Upload-Offset"])
+            length = int(request.headers.get("Content-Length") or 0)
+        except (KeyError, ValueError):
+            logger.error("Invalid Upload-Offset or Content-Length header")
+            return Response(
+                {"detail": _("Invalid Upload-Offset or Content-Length header")},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if offset != upload.offset:
+            logger.warning("Avatar upload %s offset mismatch", upload.pk)
+            return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_409_CONFLICT)
+
+        if length > settings.AVATAR_UPLOAD_MAX_CHUNK_SIZE or offset + length > upload.size:
+            logger.error("Avatar upload chunk is too large")
+            return Response(
+                {"detail": _("Avatar upload chunk is too large")},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        written = write_chunk(upload, offset, request.stream, length)  # type: ignore[arg-type]
+
+        # Смещение сдвигается только если его никто не сдвинул параллельно
+        updated = AvatarUpload.objects.filter(
+            pk=upload.pk, offset=offset, status=AvatarUpload.UPLOADING
+        ).update(offset=offset + written, updated_at=timezone.now())
+
+        if not updated:
+            upload.refresh_from_db()
+            return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_409_CONFLICT)
+
+        upload.offset = offset + written
+
+        if upload.offset == upload.size:
+            complete_upload(upload)
+
+        if upload.status == AvatarUpload.FAILED:
+            return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        return Response(AvatarUploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+
+class PresenceHeartbeatView(APIView):
+    """
+    View для отметки текущего пользователя как онлайн
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request) -> Response:
+        get_presence_backend().heartbeat(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PresenceView(APIView):
+    """
+    View для проверки, какие из переданных пользователей сейчас онлайн
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request: Request) -> Response:
+        serializer = PresenceQuerySerializer(data=request.query_params)
+
+        if serializer.is_valid():
+            online = get_presence_backend().online(serializer.validated_data["ids"])
+            # id строками, как в CustomUserSerializer
+            return Response({"online": [str(user_id) for user_id in sorted(online)]}, status=status.HTTP_200_OK)
+
+        logger.warning("Invalid presence request: %s", serializer.errors)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)